@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import aiosqlite
@@ -11,11 +11,22 @@ from slowapi.middleware import SlowAPIMiddleware
 from contextlib import asynccontextmanager
 from routers.tiktok import router as tiktok_router
 from routers.file import file_router
-from db import get_db
+from db import init_sqlite_pool, close_sqlite_pool
 from database import init_db, close_db  # PostgreSQL functions
+from database import start_partition_maintenance, stop_partition_maintenance
 from routers.analytics import router as analytics_router
 from routers.anime import router as anime_router
-from helpers.anime_helper import get_animepahe_cookies
+from routers.metrics import router as metrics_router
+from helpers.cookie_cache import get_animepahe_cookies, cookie_cache
+from helpers.http_client import init_http_clients, close_http_clients
+from helpers.pipeline import resolve_pipeline
+from helpers.image_cache import image_cache
+from helpers.analytics_buffer import analytics_buffer
+from helpers.geoip import geoip
+from helpers.analytics_rollup import backfill_rollups
+from helpers.download_jobs import download_jobs
+from helpers.video_store import video_store
+from helpers.executors import init_executors, close_executors, run_in
 
 load_dotenv()
 
@@ -36,9 +47,16 @@ async def lifespan(app: FastAPI):
     
     # 1. Initialize PostgreSQL (for analytics)
     await init_db()
+    await backfill_rollups()
+    start_partition_maintenance()
     print("✅ PostgreSQL ready!")
     
-    # 2. Initialize SQLite (for caching)
+    # 2. Shared upstream HTTP clients (animepahe, kwik, CDN...) and the
+    #    executors for blocking work (yt-dlp, parsing, file I/O)
+    await init_http_clients()
+    init_executors()
+    
+    # 3. Initialize SQLite (for caching)
     async with aiosqlite.connect("cache.db") as db:
         print("📦 Setting up SQLite cache...")
         
@@ -47,10 +65,38 @@ async def lifespan(app: FastAPI):
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 title TEXT NOT NULL,
                 filepath TEXT NOT NULL,
-                short_code TEXT UNIQUE NOT NULL
+                short_code TEXT UNIQUE NOT NULL,
+                extractor TEXT,
+                video_id TEXT,
+                info TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_access REAL,
+                pinned INTEGER NOT NULL DEFAULT 0
             )
         """)
 
+        # Older databases: add canonical video id (/dl dedup) and
+        # size/access columns (download quota)
+        cursor = await db.execute("PRAGMA table_info(videos)")
+        columns = {row[1] for row in await cursor.fetchall()}
+        for column, column_type in (
+            ("extractor", "TEXT"),
+            ("video_id", "TEXT"),
+            ("info", "TEXT"),
+            ("size", "INTEGER"),
+            ("created_at", "REAL"),
+            ("last_access", "REAL"),
+            ("pinned", "INTEGER NOT NULL DEFAULT 0"),
+        ):
+            if column not in columns:
+                await db.execute(f"ALTER TABLE videos ADD COLUMN {column} {column_type}")
+
+        await db.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_canonical
+            ON videos(extractor, video_id) WHERE video_id IS NOT NULL
+        """)
+
         await db.execute("""
             CREATE TABLE IF NOT EXISTS anime_info (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -71,11 +117,26 @@ async def lifespan(app: FastAPI):
         """)
         
         await db.execute("""
-            CREATE TABLE IF NOT EXISTS anime_episode (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                page_count INTEGER,
-                episode TEXT,
-                external_id TEXT NOT NULL UNIQUE
+            CREATE TABLE IF NOT EXISTS episode_index (
+                external_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                episode NUMERIC,
+                session TEXT NOT NULL,
+                snapshot TEXT,
+                page INTEGER NOT NULL,
+                created_at TEXT,
+                PRIMARY KEY(external_id, position)
+            )
+        """)
+
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS episode_index_meta (
+                external_id TEXT PRIMARY KEY,
+                total INTEGER,
+                per_page INTEGER,
+                last_page INTEGER,
+                airing INTEGER DEFAULT 1,
+                refreshed_at REAL
             )
         """)
 
@@ -87,10 +148,27 @@ async def lifespan(app: FastAPI):
                 size TEXT,
                 snapshot TEXT,
                 episode TEXT,
+                fetched_at REAL,
+                expires_at REAL,
                 UNIQUE(internal_id, episode)
             )
         """)
+
+        # Older databases: add link expiry columns
+        cursor = await db.execute("PRAGMA table_info(cached_video_url)")
+        columns = {row[1] for row in await cursor.fetchall()}
+        for column in ("fetched_at", "expires_at"):
+            if column not in columns:
+                await db.execute(f"ALTER TABLE cached_video_url ADD COLUMN {column} REAL")
         
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS search_cache (
+                query TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+
         await db.execute("""
             CREATE TABLE IF NOT EXISTS download_sessions (
                 session_id TEXT PRIMARY KEY,
@@ -104,12 +182,43 @@ async def lifespan(app: FastAPI):
         await db.commit()
         print("✅ SQLite cache ready!")
     
+    # 4. Pooled SQLite connections (WAL readers + one writer)
+    await init_sqlite_pool()
+    
+    # 5. Warm the in-memory cookie cache from SQLite
+    await cookie_cache.load()
+    
+    # 6. Episode resolution pipeline workers
+    await resolve_pipeline.start()
+    
+    # 7. Index the on-disk image proxy cache
+    image_cache.load()
+    
+    # 8. Offline GeoIP tables + batched analytics writer
+    await run_in("blocking_io", geoip.load)
+    analytics_buffer.start()
+    
+    # 9. Worker processes for /dl/jobs
+    download_jobs.start()
+    
+    # 10. Short code index for /file + disk quota for downloads/
+    await video_store.load()
+    video_store.start()
+    
     print("🚀 Application started!")
     
     yield
     
     # SHUTDOWN
     print("🛑 Shutting down services...")
+    await resolve_pipeline.stop()
+    await download_jobs.stop()
+    await video_store.stop()  # writes back pending last-access times
+    await analytics_buffer.stop()  # flushes queued events before Postgres closes
+    await stop_partition_maintenance()
+    close_executors()
+    await close_http_clients()
+    await close_sqlite_pool()
     await close_db()
     print("👋 Application stopped!")
 
@@ -154,6 +263,7 @@ app.include_router(tiktok_router)
 app.include_router(anime_router)
 app.include_router(file_router)
 app.include_router(analytics_router)
+app.include_router(metrics_router)
 
 # ---------------- ROOT ROUTE ----------------
 @app.get(
@@ -162,8 +272,8 @@ app.include_router(analytics_router)
     summary="API Root",
     description="Welcome message and available information about the API.",
 )
-async def root(db=Depends(get_db)):
-    await get_animepahe_cookies(db)
+async def root():
+    await get_animepahe_cookies()
     return {
         "message": "Welcome to the FAST-API Service 🚀",
         "version": "1.0.0",
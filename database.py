@@ -1,4 +1,7 @@
 import asyncpg
+import asyncio
+import re
+from datetime import date, datetime
 from typing import AsyncGenerator
 import os
 from contextlib import asynccontextmanager
@@ -10,6 +13,17 @@ DATABASE_URL = os.getenv(
 # Global connection pool
 pool: asyncpg.Pool = None
 
+# analytics is range-partitioned by month on timestamp. Partitions are created
+# PARTITIONS_AHEAD months in advance; whole partitions older than
+# RETENTION_MONTHS are dropped (0 keeps everything). The rollup tables keep
+# the aggregated history of dropped months.
+PARTITIONS_AHEAD = int(os.getenv("ANALYTICS_PARTITIONS_AHEAD", "2"))
+RETENTION_MONTHS = int(os.getenv("ANALYTICS_RETENTION_MONTHS", "12"))
+MAINTENANCE_INTERVAL = 6 * 60 * 60
+PARTITION_NAME = re.compile(r"^analytics_p(\d{4})_(\d{2})$")
+
+_maintenance_task: asyncio.Task = None
+
 
 async def init_db():
     """
@@ -45,43 +59,212 @@ async def init_db():
             )
         """)
         
-        # Analytics table
+        # Analytics table (monthly partitions, see below)
+        await create_analytics_table(conn)
+        
         await conn.execute("""
-            CREATE TABLE IF NOT EXISTS analytics (
-                id SERIAL PRIMARY KEY,
-                event_type VARCHAR(50) NOT NULL,
-                anime_title VARCHAR(255),
-                episode_count INTEGER,
-                total_size VARCHAR(50),
-                from_episode INTEGER,
-                to_episode INTEGER,
-                ip_address VARCHAR(50),
-                user_agent TEXT,
-                country VARCHAR(100),
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            CREATE INDEX IF NOT EXISTS idx_session_id ON download_sessions(session_id)
         """)
         
-        # Create indexes for better performance
+        # Rollups maintained by the analytics batch writer
         await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_event_type ON analytics(event_type)
+            CREATE TABLE IF NOT EXISTS analytics_hourly (
+                bucket TIMESTAMP NOT NULL,
+                event_type VARCHAR(50) NOT NULL,
+                events BIGINT NOT NULL DEFAULT 0,
+                episodes BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, event_type)
+            )
         """)
         
         await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_anime_title ON analytics(anime_title)
+            CREATE TABLE IF NOT EXISTS analytics_daily_titles (
+                day DATE NOT NULL,
+                event_type VARCHAR(50) NOT NULL,
+                anime_title VARCHAR(255) NOT NULL,
+                events BIGINT NOT NULL DEFAULT 0,
+                episodes BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, event_type, anime_title)
+            )
         """)
         
         await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_timestamp ON analytics(timestamp)
+            CREATE TABLE IF NOT EXISTS analytics_daily_ranges (
+                day DATE NOT NULL,
+                anime_title VARCHAR(255) NOT NULL,
+                episode_range VARCHAR(50) NOT NULL,
+                PRIMARY KEY (day, anime_title, episode_range)
+            )
         """)
         
         await conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_session_id ON download_sessions(session_id)
+            CREATE TABLE IF NOT EXISTS analytics_daily_countries (
+                day DATE NOT NULL,
+                country VARCHAR(100) NOT NULL,
+                events BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, country)
+            )
         """)
         
         print("✅ Tables created successfully!")
 
 
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_of(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+async def _create_partition(conn, month: date):
+    name = f"analytics_p{month.year}_{month.month:02d}"
+    if await conn.fetchval("SELECT to_regclass($1)", name):
+        return
+    end = _add_months(month, 1)
+    create = f"""
+        CREATE TABLE IF NOT EXISTS {name} PARTITION OF analytics
+        FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')
+    """
+    stray = await conn.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM analytics_default WHERE timestamp >= $1 AND timestamp < $2)",
+        month, end
+    )
+    if not stray:
+        await conn.execute(create)
+    else:
+        # Rows that landed in the default partition for this month must move
+        # into the new partition, or Postgres refuses to create it
+        async with conn.transaction():
+            await conn.execute("CREATE TEMP TABLE analytics_moved (LIKE analytics)")
+            await conn.execute("""
+                WITH moved AS (
+                    DELETE FROM analytics_default WHERE timestamp >= $1 AND timestamp < $2 RETURNING *
+                )
+                INSERT INTO analytics_moved SELECT * FROM moved
+            """, month, end)
+            await conn.execute(create)
+            await conn.execute("INSERT INTO analytics SELECT * FROM analytics_moved")
+            await conn.execute("DROP TABLE analytics_moved")
+    print(f"📋 Created analytics partition {name}")
+
+
+async def ensure_analytics_partitions(conn, first_month: date = None):
+    """Create monthly partitions from first_month (default: this month) to PARTITIONS_AHEAD"""
+    this_month = _month_of(datetime.now())
+    month = first_month or this_month
+    while month <= _add_months(this_month, PARTITIONS_AHEAD):
+        await _create_partition(conn, month)
+        month = _add_months(month, 1)
+
+
+async def drop_expired_partitions(conn):
+    """Drop whole monthly partitions older than RETENTION_MONTHS"""
+    if RETENTION_MONTHS <= 0:
+        return []
+    cutoff = _add_months(_month_of(datetime.now()), -RETENTION_MONTHS)
+    rows = await conn.fetch("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'analytics'::regclass
+    """)
+    dropped = []
+    for row in rows:
+        match = PARTITION_NAME.match(row["relname"])
+        if match and date(int(match[1]), int(match[2]), 1) < cutoff:
+            await conn.execute(f"DROP TABLE {row['relname']}")
+            dropped.append(row["relname"])
+    if dropped:
+        print(f"🗑️ Dropped expired analytics partitions: {', '.join(dropped)}")
+    return dropped
+
+
+async def create_analytics_table(conn):
+    """Create the partitioned analytics table, migrating a plain one if present"""
+    kind = await conn.fetchval(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('analytics')")
+    if kind == "p":
+        await conn.execute("CREATE TABLE IF NOT EXISTS analytics_default PARTITION OF analytics DEFAULT")
+        await ensure_analytics_partitions(conn)
+        return
+
+    async with conn.transaction():
+        if kind:
+            print("📋 Migrating analytics to monthly partitions...")
+            await conn.execute("ALTER TABLE analytics RENAME TO analytics_legacy")
+        # The id sequence outlives the legacy table so ids keep counting up
+        await conn.execute("CREATE SEQUENCE IF NOT EXISTS analytics_id_seq AS BIGINT")
+        await conn.execute("ALTER SEQUENCE analytics_id_seq AS BIGINT")
+        await conn.execute("""
+            CREATE TABLE analytics (
+                id BIGINT NOT NULL DEFAULT nextval('analytics_id_seq'),
+                event_type VARCHAR(50) NOT NULL,
+                anime_title VARCHAR(255),
+                episode_count INTEGER,
+                total_size VARCHAR(50),
+                from_episode INTEGER,
+                to_episode INTEGER,
+                ip_address VARCHAR(50),
+                user_agent TEXT,
+                country VARCHAR(100),
+                timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """)
+        await conn.execute("ALTER SEQUENCE analytics_id_seq OWNED BY analytics.id")
+        # Catches rows outside every monthly partition (clock skew, old imports)
+        await conn.execute("CREATE TABLE analytics_default PARTITION OF analytics DEFAULT")
+        # Block-range index: tiny, cheap to maintain, good for time-ordered scans
+        await conn.execute("CREATE INDEX idx_analytics_timestamp_brin ON analytics USING BRIN (timestamp)")
+
+        first_month = None
+        if kind:
+            oldest = await conn.fetchval("SELECT MIN(timestamp) FROM analytics_legacy")
+            first_month = _month_of(oldest) if oldest else None
+        await ensure_analytics_partitions(conn, first_month)
+
+        if kind:
+            await conn.execute("""
+                INSERT INTO analytics
+                    (id, event_type, anime_title, episode_count, total_size, from_episode,
+                     to_episode, ip_address, user_agent, country, timestamp)
+                SELECT id, event_type, anime_title, episode_count, total_size, from_episode,
+                       to_episode, ip_address, user_agent, country,
+                       COALESCE(timestamp, CURRENT_TIMESTAMP)
+                FROM analytics_legacy
+            """)
+            await conn.execute(
+                "SELECT setval('analytics_id_seq', GREATEST((SELECT MAX(id) FROM analytics), 1))")
+            await conn.execute("DROP TABLE analytics_legacy")
+            print("✅ Analytics migrated to monthly partitions")
+
+
+async def _maintain_partitions():
+    while True:
+        try:
+            async with pool.acquire() as conn:
+                await ensure_analytics_partitions(conn)
+                await drop_expired_partitions(conn)
+        except Exception as e:
+            print(f"❌ Analytics partition maintenance failed: {e}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+
+def start_partition_maintenance():
+    """Background job keeping future partitions created and old ones dropped"""
+    global _maintenance_task
+    _maintenance_task = asyncio.create_task(_maintain_partitions())
+
+
+async def stop_partition_maintenance():
+    global _maintenance_task
+    if _maintenance_task:
+        _maintenance_task.cancel()
+        await asyncio.gather(_maintenance_task, return_exceptions=True)
+        _maintenance_task = None
+
+
 async def close_db():
     """
     Close database connection pool
@@ -1,11 +1,225 @@
+import asyncio
+import os
+import time
 import aiosqlite
+from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
-async def get_db() -> AsyncGenerator[aiosqlite.Connection, None]:
-    db = await aiosqlite.connect("cache.db")
-    db.row_factory = aiosqlite.Row  # optional: so results behave like dicts
+DB_PATH = "cache.db"
+READER_COUNT = int(os.getenv("SQLITE_READERS", "4"))
+STATEMENT_CACHE_SIZE = 256
 
-    try:
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA cache_size=-16000",  # 16 MB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+]
+
+READ_PREFIXES = ("SELECT", "PRAGMA", "EXPLAIN")
+
+
+def _is_write(sql: str) -> bool:
+    return not sql.lstrip().upper().startswith(READ_PREFIXES)
+
+
+class _WaitStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, started):
+        waited = time.perf_counter() - started
+        self.count += 1
+        self.total += waited
+        self.max = max(self.max, waited)
+
+    def as_dict(self):
+        return {
+            "acquired": self.count,
+            "avg_wait_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_wait_ms": round(self.max * 1000, 3),
+        }
+
+
+class SQLitePool:
+    """A few reader connections plus one dedicated writer connection"""
+
+    def __init__(self, path=DB_PATH, readers=READER_COUNT):
+        self.path = path
+        self.reader_count = readers
+        self.readers: asyncio.Queue = asyncio.Queue()
+        self.writer: aiosqlite.Connection = None
+        self.writer_lock = asyncio.Lock()
+        self.reader_wait = _WaitStats()
+        self.writer_wait = _WaitStats()
+
+    async def _connect(self):
+        conn = await aiosqlite.connect(self.path, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = aiosqlite.Row
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+
+    async def open(self):
+        self.writer = await self._connect()
+        for _ in range(self.reader_count):
+            self.readers.put_nowait(await self._connect())
+
+    async def close(self):
+        while not self.readers.empty():
+            await self.readers.get_nowait().close()
+        if self.writer:
+            await self.writer.close()
+            self.writer = None
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        A handle for a unit of work. It holds no connection itself: each read
+        borrows a reader for one statement, writes take the writer until
+        commit/rollback. Nested or long-lived handles therefore can't starve
+        the pool.
+        """
+        conn = PooledConnection(self)
+        try:
+            yield conn
+        finally:
+            await conn.release()
+
+    @asynccontextmanager
+    async def _reader(self):
+        started = time.perf_counter()
+        reader = await self.readers.get()
+        self.reader_wait.record(started)
+        try:
+            yield reader
+        finally:
+            self.readers.put_nowait(reader)
+
+    def stats(self):
+        return {
+            "readers": self.reader_count,
+            "idle_readers": self.readers.qsize(),
+            "writer_busy": self.writer_lock.locked(),
+            "reader_wait": self.reader_wait.as_dict(),
+            "writer_wait": self.writer_wait.as_dict(),
+        }
+
+
+class _Rows:
+    """Fully fetched result of a read, so the reader goes back right away"""
+
+    def __init__(self, rows, description):
+        self._rows = rows
+        self.description = description
+        self.rowcount = -1
+        self.lastrowid = None
+
+    async def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    async def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    async def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class PooledConnection:
+    """
+    Connection handed out by get_db.
+    Each read runs on a reader borrowed for that statement. The first write
+    takes the writer lock and every statement after it runs on the writer
+    until commit/rollback.
+    """
+
+    def __init__(self, pool: SQLitePool):
+        self._pool = pool
+        self._writing = False
+
+    async def _acquire_writer(self):
+        if not self._writing:
+            started = time.perf_counter()
+            await self._pool.writer_lock.acquire()
+            self._pool.writer_wait.record(started)
+            self._writing = True
+        return self._pool.writer
+
+    async def execute(self, sql, parameters=()):
+        if self._writing or _is_write(sql):
+            writer = await self._acquire_writer()
+            return await writer.execute(sql, parameters)
+        async with self._pool._reader() as reader:
+            cursor = await reader.execute(sql, parameters)
+            rows = await cursor.fetchall()
+            description = cursor.description
+            await cursor.close()
+        return _Rows(list(rows), description)
+
+    async def executemany(self, sql, parameters):
+        writer = await self._acquire_writer()
+        return await writer.executemany(sql, parameters)
+
+    async def commit(self):
+        if self._writing:
+            try:
+                await self._pool.writer.commit()
+            finally:
+                self._release_writer()
+
+    async def rollback(self):
+        if self._writing:
+            try:
+                await self._pool.writer.rollback()
+            finally:
+                self._release_writer()
+
+    def _release_writer(self):
+        self._writing = False
+        self._pool.writer_lock.release()
+
+    async def release(self):
+        # Uncommitted writes are rolled back when the unit of work ends
+        await self.rollback()
+
+
+# Global pool, created in lifespan
+pool: SQLitePool = None
+
+
+async def init_sqlite_pool():
+    """
+    Open the SQLite connection pool (WAL mode)
+    Run this on startup!
+    """
+    global pool
+    pool = SQLitePool()
+    await pool.open()
+    print(f"✅ SQLite pool ready ({pool.reader_count} readers + 1 writer)")
+
+
+async def close_sqlite_pool():
+    """
+    Close the SQLite connection pool
+    Run this on shutdown!
+    """
+    global pool
+    if pool:
+        await pool.close()
+        pool = None
+        print("🔌 SQLite pool closed")
+
+
+def get_sqlite_stats():
+    return pool.stats() if pool else {}
+
+
+async def get_db() -> AsyncGenerator[PooledConnection, None]:
+    async with pool.connection() as db:
         yield db
-    finally:
-        await db.close()
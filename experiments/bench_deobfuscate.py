@@ -0,0 +1,168 @@
+import glob
+import os
+import random
+import re
+import string
+import sys
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helper import deobfuscate
+
+# Compares utils.helper.deobfuscate with the implementation it replaced
+# (kept below as deobfuscate_reference): checks they return identical output
+# on the kwik fixtures and on random packer inputs, then reports per-call
+# time and throughput (MB of packed script per second) for both.
+#
+#   python experiments/bench_deobfuscate.py [--rounds N]
+#
+# Fixtures come from experiments/make_kwik_fixtures.py.
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "kwik")
+PACKED_SCRIPT = re.compile(r"<script>(eval\(function\(h,u,n,t,e,r\).*?)</script>", re.S)
+
+
+def deobfuscate_reference(packed_code):
+    """utils.helper.deobfuscate before the table-driven rewrite"""
+    # 1. Extract the arguments from the eval(function(...)...) call
+    pattern = r'eval\(function\(.*?\)\{(.*?)\}\("(.*?)",(\d+),"(.*?)",(\d+),(\d+),(\d+)\)\)'
+    match = re.search(pattern, packed_code, re.S)
+
+    if not match:
+        print("No match found")
+        return None
+
+    func_body, payload, p1, delimiter, p2, p3, p4 = match.groups()
+
+    p1 = int(p1)
+    p2 = int(p2)
+    p3 = int(p3)
+    p4 = int(p4)
+
+    # 2. Base conversion function (same logic as _0xe46c in JS)
+    def base_convert(zq, Pt, lS):
+        g = list("0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ+/")
+        h = g[:Pt]
+        i = g[:lS]
+
+        # Convert reversed encoded string → integer
+        j = 0
+        for power, char in enumerate(reversed(zq)):
+            if char in h:
+                j += h.index(char) * (Pt ** power)
+
+        # Convert integer to base-lS
+        if j == 0:
+            return "0"
+
+        result = ""
+        while j > 0:
+            result = i[j % lS] + result
+            j //= lS
+
+        return result
+
+    XP = ""
+    Qz = list(delimiter)
+    
+    i = 0
+    length = len(payload)
+
+    # 3. Loop through payload and decode chunks
+    while i < length:
+        s = ""
+
+        # build chunk until hitting the separator character
+        while i < length and payload[i] != Qz[p3]:
+            s += payload[i]
+            i += 1
+
+        # skip delimiter
+        i += 1
+
+        if s:
+            # Replace each delimiter symbol with its index
+            for idx, symbol in enumerate(Qz):
+                s = s.replace(symbol, str(idx))
+
+            # Convert chunk and append the decoded character
+            char_code = int(base_convert(s, p3, 10)) - p2
+            XP += chr(char_code)
+
+    # 4. Decode unicode
+    return urllib.parse.unquote(XP)
+
+
+
+def load_fixtures():
+    fixtures = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        name = os.path.basename(path)[:-len(".html")]
+        with open(path) as f:
+            packed = PACKED_SCRIPT.search(f.read()).group(1)
+        with open(os.path.join(FIXTURE_DIR, f"{name}.expected.js")) as f:
+            fixtures[name] = (packed, f.read())
+    return fixtures
+
+
+def random_packed(rng):
+    """Packer-shaped input with odd alphabets (digits, repeats) and stray characters"""
+    base = rng.randint(2, 10)
+    alphabet = "".join(rng.choices(string.ascii_letters + string.digits, k=base + rng.randint(1, 4)))
+    separator = alphabet[base]
+    pieces = []
+    for _ in range(rng.randint(1, 300)):
+        chunk = "".join(rng.choices(alphabet[:base] + "xyz09", k=rng.randint(1, 4)))
+        pieces.append(chunk.replace(separator, ""))
+    payload = separator.join(pieces) + rng.choice(["", separator])
+    offset = rng.randint(0, 5)
+    return f'eval(function(h,u,n,t,e,r){{}}("{payload}",1,"{alphabet}",{offset},{base},1))'
+
+
+def run(fn, packed):
+    try:
+        return fn(packed)
+    except (ValueError, OverflowError, IndexError) as e:
+        return type(e).__name__
+
+
+def check_parity(fixtures, samples=2000):
+    for name, (packed, expected) in fixtures.items():
+        assert deobfuscate_reference(packed) == expected, f"reference drifted on {name}"
+        assert deobfuscate(packed) == expected, f"mismatch on fixture {name}"
+    rng = random.Random(23)
+    for i in range(samples):
+        packed = random_packed(rng)
+        assert run(deobfuscate, packed) == run(deobfuscate_reference, packed), f"mismatch on random input {i}: {packed}"
+    print(f"✅ Identical output on {len(fixtures)} fixtures and {samples} random inputs\n")
+
+
+def measure(fn, packed, rounds):
+    fn(packed)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(packed)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    rounds = int(sys.argv[sys.argv.index("--rounds") + 1]) if "--rounds" in sys.argv else 50
+    fixtures = load_fixtures()
+    if not fixtures:
+        print("❌ No fixtures, run experiments/make_kwik_fixtures.py first")
+        return
+    check_parity(fixtures)
+
+    print(f"{'fixture':<18} {'packed KB':>9} {'old ms':>8} {'new ms':>8} {'old MB/s':>9} {'new MB/s':>9} {'speedup':>8}")
+    for name, (packed, _) in fixtures.items():
+        old = measure(deobfuscate_reference, packed, rounds)
+        new = measure(deobfuscate, packed, rounds)
+        mb = len(packed) / 1e6
+        print(f"{name:<18} {len(packed) / 1024:>9.1f} {old * 1000:>8.2f} {new * 1000:>8.2f} "
+              f"{mb / old:>9.2f} {mb / new:>9.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
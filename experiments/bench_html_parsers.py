@@ -0,0 +1,71 @@
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from helpers.anime_helper import (
+    _parse_pahewin_html, _parse_pahewin_html_soup,
+    _parse_kiwi_url, _parse_kiwi_url_soup,
+)
+from utils.html_scan import script_texts
+
+# Parse time per page for the three per-episode HTML parses, BeautifulSoup
+# (html.parser) against the fast extractors in utils/html_scan.py:
+#   play page   div#pickDownload -> pahe.win link   (_parse_pahewin_html)
+#   pahe.win    first <script> -> kwik link          (_parse_kiwi_url)
+#   kwik        all <script> bodies (the packed one is deobfuscated after)
+#
+#   python experiments/bench_html_parsers.py [--rounds N]
+#
+# Run experiments/parity_html_parsers.py first; this only times.
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+PARSERS = {
+    # page prefix: (label, soup, fast)
+    "play_": ("play page", lambda page: _parse_pahewin_html_soup(page, ""), lambda page: _parse_pahewin_html(page, "")),
+    "win_": ("pahe.win", _parse_kiwi_url_soup, _parse_kiwi_url),
+    "episode_": ("kwik", lambda page: [s.text for s in BeautifulSoup(page, "html.parser").find_all("script")], script_texts),
+}
+
+
+def measure(fn, page, rounds):
+    fn(page)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(page)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    rounds = int(sys.argv[sys.argv.index("--rounds") + 1]) if "--rounds" in sys.argv else 100
+    paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*", "*.html")))
+    if not paths:
+        print("❌ No fixtures, run experiments/make_pahe_fixtures.py and make_kwik_fixtures.py first")
+        return
+
+    stdout = sys.stdout
+    print(f"{'page':<24} {'type':<10} {'KB':>6} {'soup ms':>8} {'fast ms':>8} {'speedup':>8}")
+    for path in paths:
+        name = os.path.basename(path)[:-len(".html")]
+        prefix = next((p for p in PARSERS if name.startswith(p)), None)
+        if prefix is None:
+            continue
+        label, soup, fast = PARSERS[prefix]
+        with open(path) as f:
+            page = f.read()
+        sys.stdout = open(os.devnull, "w")  # "No link found" and friends
+        try:
+            slow_s = measure(soup, page, rounds)
+            fast_s = measure(fast, page, rounds)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        print(f"{name:<24} {label:<10} {len(page) / 1024:>6.1f} {slow_s * 1000:>8.3f} {fast_s * 1000:>8.3f} {slow_s / fast_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import tempfile
+import yt_dlp
+
+# Compares the old two-pass flow (extract_info, then yt.download([url]))
+# with the single-pass flow in helpers/download.py (extract_info, then
+# process_ie_result on the same info dict). Counts HTTP requests yt-dlp
+# makes and wall time per platform.
+#
+#   python experiments/bench_ytdlp_single_pass.py [url ...]
+#
+# By default the media itself is not fetched (skip_download), so the numbers
+# isolate extraction overhead. Pass --download to include the media.
+
+SAMPLE_URLS = {
+    "tiktok": "https://www.tiktok.com/@scout2015/video/6718335390845095173",
+    "youtube": "https://www.youtube.com/watch?v=jNQXAC9IVRw",
+    "facebook": "https://www.facebook.com/watch/?v=10153231379946729",
+}
+
+BASE_OPTIONS = {
+    "format": "bestvideo[vcodec^=avc1]+bestaudio/best",
+    "quiet": True,
+    "nocheckcertificate": True,
+    "noprogress": True,
+}
+
+
+class RequestCounter:
+    """Counts every request issued through YoutubeDL.urlopen"""
+
+    def __init__(self):
+        self.count = 0
+        self._original = yt_dlp.YoutubeDL.urlopen
+
+    def __enter__(self):
+        counter = self
+
+        def counting_urlopen(ydl, req):
+            counter.count += 1
+            return counter._original(ydl, req)
+
+        yt_dlp.YoutubeDL.urlopen = counting_urlopen
+        return self
+
+    def __exit__(self, *exc):
+        yt_dlp.YoutubeDL.urlopen = self._original
+
+
+def two_pass(url, options):
+    with yt_dlp.YoutubeDL({"quiet": True}) as yt:
+        yt.extract_info(url, download=False)
+    with yt_dlp.YoutubeDL(options) as yt:
+        yt.download([url])
+
+
+def single_pass(url, options):
+    with yt_dlp.YoutubeDL(options) as yt:
+        info = yt.extract_info(url, download=False)
+        yt.process_ie_result(info, download=True)
+
+
+def measure(flow, url, options):
+    with RequestCounter() as counter:
+        start = time.perf_counter()
+        try:
+            flow(url, options)
+            error = None
+        except Exception as e:
+            error = str(e).splitlines()[0][:80]
+        elapsed = time.perf_counter() - start
+    return counter.count, elapsed, error
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    download = "--download" in sys.argv
+    urls = {f"url{i + 1}": u for i, u in enumerate(args)} if args else SAMPLE_URLS
+
+    print(f"🧪 yt-dlp extraction benchmark ({'with' if download else 'without'} media download)\n")
+    print(f"{'platform':<10} {'flow':<12} {'requests':>8} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, url in urls.items():
+            for flow in (two_pass, single_pass):
+                options = {
+                    **BASE_OPTIONS,
+                    "outtmpl": os.path.join(tmp, f"{name}_{flow.__name__}.%(ext)s"),
+                    "skip_download": not download,
+                }
+                requests, elapsed, error = measure(flow, url, options)
+                line = f"{name:<10} {flow.__name__:<12} {requests:>8} {elapsed:>8.2f}"
+                print(line + (f"  ❌ {error}" if error else ""))
+            print()
+
+
+if __name__ == "__main__":
+    main()
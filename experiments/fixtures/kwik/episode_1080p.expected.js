@@ -0,0 +1 @@
+var url='https://kwik.cx/e/XY2qimtwf8psH';$(document).ready(function(){var t=setTimeout(function(){$('#download-box').html('<form action="https://kwik.cx/d/XY2qimtwf8psH" method="POST"><input type="hidden" name="_token" value="ZZnhJxdIZgrcPylLfYgMSlmJ3yXlb9gJotKtSX4R"><button type="submit" class="button is-uppercase is-success is-fullwidth"><i class="fas fa-download"></i> Download <span class="is-size-7">(1.02 GB)</span></button></form>');},3471);var _0x8dcd=['ZY7brGRnMHQl1fRu','0.028038'];var _0xff51=['XsLzqsahBR2hrHNF','0.649252'];var _0x2bbe=['EBKNFss9MT7FS2yo','0.336909'];var _0x0c8e=['gAEljdoG8H9lD6dz','0.572560'];var _0x8d5c=['GEQ9Yh1IsTIqeetH','0.414330'];var _0x86d2=['MhPJyKUExpw3qKYO','0.133776'];var _0x369f=['DmonmIg7jfueEMOB','0.029179'];var _0x55b1=['mbxuSLlS2pBa4FaH','0.457134'];var _0x07c9=['YlyhkAbYTgaIBDbR','0.624915'];var _0x7de0=['hOCILzWFwGinoMRh','0.342848'];var _0xf9a7=['2j8db3MNeSl6LxZw','0.282072'];var _0xdcdf=['0zqtS0qGXqAbrR5j','0.346779'];var _0xf7a6=['yAtWfYG4yKNhVRzV','0.271146'];var _0xd555=['7RbqNRbOWUgVUA0A','0.110964'];var _0x95a7=['3MACtMig0wKjWK9s','0.498425'];var _0x2dcd=['SUqFxMJyx70f2uq6','0.102096'];var _0xd1aa=['SsfmAt0vBLh4rPeq','0.126848'];var _0x67a6=['BdzYIlyS33lUzHAd','0.309315'];var _0xf4e8=['VVSo4S3UAqtLB7Rx','0.294370'];var _0x7f99=['RbBOuhZ1QGI5nQC6','0.824123'];var _0x5017=['OR4qdE47myBH73BY','0.483429'];var _0x99d1=['qjfyaLz0doLYfKff','0.658274'];var _0x02bc=['j2oM9iXyGFOexBaK','0.985914'];var _0x1427=['ybcomcvcgGQAHrT4','0.429605'];var _0x20e3=['gAYPAATtjm3UFv7n','0.995625'];var _0x1454=['ENmgeEETG5x6ZxoT','0.100489'];var _0xd6fc=['6oAD6ltuXVXH43kI','0.207635'];var _0x6ab4=['Ntb8YpkB5SzV6UBm','0.437937'];var _0x55ce=['OvUEJiALc8nUi9vj','0.496137'];var _0x549d=['2rlIcU44pqvmEhGC','0.392629'];var _0x44e7=['XqREDohJ9Btz7tAG','0.973495'];var _0x68bc=['79yib5R12Ubyg5Gu','0.051237'];var _0xd9f5=['XpeiC5P0AIFcpZcf','0.446088'];var _0xa128=['Ap2DKaq2Ng09pSw8','0.906666'];var _0x05f1=['VC277vWo5zcBt2kO','0.170248'];var _0x5968=['xzEDkKu3BwZk8ZeN','0.457090'];var _0x7589=['K5JEjXn8bl5xFZ7T','0.134196'];var _0x6221=['UBKF5g6VZNYm0Uyv','0.627968'];var _0x6cfc=['hB4a7sn9GxDTqEdp','0.976175'];var _0x0e45=['G3DqPEAEF4LrlJ8P','0.892541'];var _0xe69f=['QUm8yoXjqLKew73R','0.451350'];var _0xa73b=['AKkOzC1dbBmHYJ8Y','0.902139'];var _0x4c93=['C27uexSwG3NnTEMI','0.786460'];var _0x72da=['7YwZln1zQNyxLlPl','0.385299'];var _0xa32c=['jiRlXLGyWVCpEBT7','0.111581'];var _0x1a6e=['SMbmjDMIOcdhagDA','0.681352'];var _0x913a=['Aye4hXDQUU71k0L6','0.812684'];var _0xed6e=['d9jDyYFLszZcbri3','0.776484'];var _0xfb23=['ivdTN3DXuo0eEctZ','0.931098'];var _0x0ec5=['uCzMbsNgHRjCwsk0','0.066439'];var _0x696b=['0BwqVnus78wgn7Z2','0.797806'];var _0x8d2a=['AGKvtCLZU5ItI0jQ','0.692848'];var _0xb591=['KmCkIQauTZFtKNJX','0.742293'];var _0xc407=['RslvQgrPU8eADK5M','0.768406'];var _0x772c=['HtOq69uZIccHiva2','0.536273'];var _0x53ce=['F5lopRbBeIvwQOQt','0.646873'];var _0x8f0b=['FAGge55Jz2rVdWrp','0.564195'];var _0x8f57=['q68n8Xx0MdQHZTzl','0.698244'];var _0xd914=['GbZU4UWBnRS7QFln','0.445356'];var _0x65db=['JhGBVfEtgZt8LnFO','0.304692'];});
\ No newline at end of file
@@ -0,0 +1 @@
+var url='https://kwik.cx/e/5t4fmi4eYehVC';$(document).ready(function(){var t=setTimeout(function(){$('#download-box').html('<form action="https://kwik.cx/d/5t4fmi4eYehVC" method="POST"><input type="hidden" name="_token" value="4MolgMHfsraWL5M3NQOUejqbJdTc4oOvu4fNBp3d"><button type="submit" class="button is-uppercase is-success is-fullwidth"><i class="fas fa-download"></i> Download <span class="is-size-7">(58.21 MB)</span></button></form>');},1777);var _0xc452=['4rOrstBeYR7zhGLa','0.893335'];var _0x9f2f=['jOgAhkxXlP1nfEWK','0.735438'];var _0xfdd6=['58rpmeQSJsaHakfr','0.466223'];var _0x40fc=['rbOhPA9ZTszbeyfc','0.851438'];});
\ No newline at end of file
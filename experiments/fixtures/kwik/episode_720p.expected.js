@@ -0,0 +1 @@
+var url='https://kwik.cx/e/UjU1BfcLBMss9';$(document).ready(function(){var t=setTimeout(function(){$('#download-box').html('<form action="https://kwik.cx/d/UjU1BfcLBMss9" method="POST"><input type="hidden" name="_token" value="nrXmkASHCycIM6cV9LKDwo1HUtkeiv3tVy1Dq4wq"><button type="submit" class="button is-uppercase is-success is-fullwidth"><i class="fas fa-download"></i> Download <span class="is-size-7">(109.91 MB)</span></button></form>');},3154);var _0xe065=['pZECX1ajCpIjxrpG','0.303134'];var _0x1823=['fmmZLPwLIh2gDgdv','0.111375'];var _0xd481=['G8orrf5mimfUK0R3','0.866867'];var _0xa5cd=['ZcoSgq0xzvnawmFg','0.515113'];var _0xb25a=['DYnVt1gN50WgA3Q5','0.600990'];var _0xe7c0=['hjBgxpvOG1kBHrdk','0.893044'];var _0x4e47=['aUSamz5lAtyhSRQU','0.281674'];var _0xcd8a=['lSRsNH4t8Wdzev10','0.304627'];var _0x03cb=['9HpxsprN48Dq4YS0','0.125667'];var _0x1b91=['ZF42qItZJzfacyHm','0.372177'];var _0x365a=['ltZA8OU5CB8E7Xea','0.881831'];var _0xe14d=['VGppt02thkollXga','0.501534'];var _0x1834=['dEGpLHgSlWwFr10r','0.301718'];var _0xff73=['YoVRKgzciFk0UG32','0.945459'];var _0xc016=['ed1ucJS7eQhIrha6','0.562740'];var _0xb9bd=['nim61P3RCXlpsoXM','0.210675'];var _0x0b8f=['eWX5mMchcNWGYpZu','0.589691'];var _0xcb67=['Phw4VYtNalNtEO6T','0.271109'];var _0x9993=['evHdrt4CecvRT52q','0.089731'];var _0x0cc6=['UOIkSlaEPLz4Vu3p','0.358029'];});
\ No newline at end of file
@@ -0,0 +1 @@
+var url='https://kwik.cx/e/ujOeHwdFcAefA';$(document).ready(function(){var t=setTimeout(function(){$('#download-box').html('<form action="https://kwik.cx/d/ujOeHwdFcAefA" method="POST"><input type="hidden" name="_token" value="mmM30DOXfO4WUDlWuX8yy6Skhj4YjZ8OvIia8OG5"><button type="submit" class="button is-uppercase is-success is-fullwidth"><i class="fas fa-download"></i> Download ✓ <span class="is-size-7">(231.4 MB)</span></button></form>');},2776);var _0x3f62=['6NKdKdnIizHJIQgJ','0.187871'];var _0x31e2=['HddmQAtKCsXRpJG2','0.729445'];var _0x936c=['LeFkv5A7eIWYvvEX','0.068763'];var _0x2feb=['6DPdRO9YrxPbCkhd','0.768233'];var _0x4238=['Ty4EkyriAIR9Qxof','0.151298'];var _0x7777=['aZlrjHLth16OTC27','0.680575'];var _0xc8e5=['yyDyl9BgLgJH6Mem','0.376229'];var _0x8127=['7LDhE8DtiUTDQGm7','0.361752'];var _0x0dd8=['VsNf0G4wnHFNMWVm','0.239388'];var _0xcd26=['ToGwbbrqQ7B697wn','0.226846'];});
\ No newline at end of file
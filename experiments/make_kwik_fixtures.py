@@ -0,0 +1,121 @@
+import os
+import random
+import string
+from bench_deobfuscate import deobfuscate_reference
+
+# Writes kwik download pages into experiments/fixtures/kwik/ in the layout
+# kwik serves: the packed eval(function(h,u,n,t,e,r)...) script is the third
+# script from the end, packed with a random alphabet, base and offset like
+# the live pages. <name>.expected.js is what the original (pre-rewrite)
+# deobfuscate returns for that script. Seeded, so reruns are identical.
+#
+#   python experiments/make_kwik_fixtures.py
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "kwik")
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title} :: Kwik</title>
+<link rel="stylesheet" href="https://kwik.cx/css/app.css">
+<script src="https://kwik.cx/js/jquery.min.js"></script>
+</head>
+<body>
+<nav class="navbar"><a class="navbar-item" href="https://kwik.cx/">Kwik</a></nav>
+<section class="section">
+<div class="container">
+<h1 class="title is-5">{title}</h1>
+<div class="columns"><div class="column is-half is-offset-one-quarter">
+<div class="box" id="download-box"><p>Please wait...</p></div>
+</div></div>
+</div>
+</section>
+{filler}
+<script>{packed}</script>
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}} gtag('js', new Date());</script>
+<script>$(function(){{ $('.navbar-burger').click(function(){{ $('.navbar-menu').toggleClass('is-active'); }}); }});</script>
+</body>
+</html>
+"""
+
+SCRIPT = (
+    "var url='https://kwik.cx/e/{code}';"
+    "$(document).ready(function(){{var t=setTimeout(function(){{"
+    "$('#download-box').html('<form action=\"https://kwik.cx/d/{code}\" method=\"POST\">"
+    "<input type=\"hidden\" name=\"_token\" value=\"{token}\">"
+    "<button type=\"submit\" class=\"button is-uppercase is-success is-fullwidth\">"
+    "<i class=\"fas fa-download\"></i> Download {note}<span class=\"is-size-7\">({size})</span>"
+    "</button></form>');}},{delay});"
+    "{padding}}});"
+)
+
+
+def pack(text, rng):
+    """Encode text the way kwik's packer does"""
+    base = rng.randint(2, 8)
+    alphabet = "".join(rng.sample(string.ascii_letters, base + 1 + rng.randint(0, 3)))
+    offset = rng.randint(5, 60)
+    digits, separator = alphabet[:base], alphabet[base]
+    chunks = []
+    for char in text:
+        number = ord(char) + offset
+        encoded = ""
+        while True:
+            encoded = digits[number % base] + encoded
+            number //= base
+            if not number:
+                break
+        chunks.append(encoded + separator)
+    return (
+        'eval(function(h,u,n,t,e,r){r="";for(var i=0,len=h.length;i<len;i++){var s="";'
+        'while(h[i]!==n[e]){s+=h[i];i++}for(var j=0;j<n.length;j++)s=s.replace(new RegExp(n[j],"g"),j);'
+        'r+=String.fromCharCode(_0xe46c(s,e,10)-t)}return decodeURIComponent(escape(r))}'
+        f'("{"".join(chunks)}",{rng.randint(10, 99)},"{alphabet}",{offset},{base},{rng.randint(10, 99)}))'
+    )
+
+
+def _token(rng, length):
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=length))
+
+
+def make_page(name, size, note, padding_ops, seed):
+    rng = random.Random(seed)
+    code = _token(rng, 13)
+    padding = "".join(
+        f"var _0x{rng.randrange(16 ** 4):04x}=['{_token(rng, 16)}','{rng.random():.6f}'];"
+        for _ in range(padding_ops)
+    )
+    script = SCRIPT.format(
+        code=code, token=_token(rng, 40), note=note, size=size,
+        delay=rng.randint(1000, 5000), padding=padding,
+    )
+    filler = "\n".join(f"<p class=\"is-hidden\">{_token(rng, 48)}</p>" for _ in range(rng.randint(5, 40)))
+    packed = pack(script, rng)
+    html = PAGE.format(title=f"{name}.mp4", filler=filler, packed=packed)
+    return html, deobfuscate_reference(packed)
+
+
+FIXTURES = {
+    # name: (size label, extra note, padding statements, seed)
+    "episode_360p": ("58.21 MB", "", 4, 360),
+    "episode_720p": ("109.91 MB", "", 20, 720),
+    "episode_1080p": ("1.02 GB", "", 60, 1080),
+    # percent-encoded text is decoded by the final unquote
+    "episode_unicode": ("231.4 MB", "%E2%9C%93 ", 10, 7),
+}
+
+
+def main():
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for name, (size, note, padding_ops, seed) in FIXTURES.items():
+        html, expected = make_page(name, size, note, padding_ops, seed)
+        with open(os.path.join(FIXTURE_DIR, f"{name}.html"), "w") as f:
+            f.write(html)
+        with open(os.path.join(FIXTURE_DIR, f"{name}.expected.js"), "w") as f:
+            f.write(expected)
+        print(f"✅ {name}: {len(html)} bytes page, {len(expected)} chars unpacked")
+
+
+if __name__ == "__main__":
+    main()
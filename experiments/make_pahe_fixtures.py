@@ -0,0 +1,148 @@
+import os
+import random
+import string
+
+# Writes animepahe play pages and pahe.win redirect pages into
+# experiments/fixtures/pahe/ in the layout those sites serve: a play page
+# has its scripts, navigation and episode/resolution menus around the
+# div#pickDownload dropdown; a pahe.win page carries the kwik link in its
+# first <script>. Seeded, so reruns are identical.
+#
+#   python experiments/make_pahe_fixtures.py
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pahe")
+
+PLAY_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">
+<title>{title} Ep. {episode} :: animepahe</title>
+<link rel="stylesheet" href="https://animepahe.si/css/app.css">
+<style>.episode-menu .dropdown-item{{font-size:.8rem}} .badge > span{{opacity:.6}}</style>
+<script>window.__app = {{"session": "{session}", "anime": "{anime_id}", "menu": "<div id=\\"pickDownload\\">"}};</script>
+<script src="https://animepahe.si/js/app.js" defer></script>
+</head>
+<body>
+<!-- <div id="pickDownload"><a class="dropdown-item" href="https://pahe.win/old">old 720p</a></div> -->
+<nav class="navbar navbar-expand-lg"><a class="navbar-brand" href="/">animepahe</a>
+<ul class="navbar-nav">{nav}</ul></nav>
+<section class="main">
+<div class="theatre">
+<div class="theatre-info"><h1><a href="/anime/{anime_id}" title="{title}">{title}</a> - {episode}</h1></div>
+<div class="episode-menu dropdown">
+<button class="btn btn-dark dropdown-toggle" id="episodeMenu" data-toggle="dropdown">Episode {episode}</button>
+<div class="dropdown-menu" aria-labelledby="episodeMenu" id="scrollArea">
+{episodes}
+</div>
+</div>
+<div class="resolution-menu dropdown">
+<button class="btn btn-dark dropdown-toggle" id="resolutionMenu" data-toggle="dropdown">360p</button>
+<div id="resolutionMenu" class="dropdown-menu">
+{resolutions}
+</div>
+</div>
+<div class="download-menu dropdown">
+<button class="btn btn-dark dropdown-toggle" id="downloadMenu" data-toggle="dropdown"><i class="fas fa-download"></i></button>
+<DIV id="pickDownload" class="dropdown-menu dropdown-menu-right" aria-labelledby="downloadMenu">
+{downloads}
+</DIV>
+</div>
+</div>
+</section>
+<section class="comments">{comments}</section>
+<script>$(function(){{ $('#pickDownload a').on('click', function(){{ gtag('event', 'download'); }}); }});</script>
+</body>
+</html>
+"""
+
+WIN_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>pahe.win</title>
+<link rel="stylesheet" href="https://pahe.win/css/style.css">
+</head>
+<body>
+<div class="container"><div class="box">
+<p>Redirecting to <a href="https://pahe.win/">pahe.win</a>...</p>
+<a class="redirect" href="#" id="redirect">Continue</a>
+</div></div>
+<script>var _0x{tag}=['{noise}'];$("a.redirect").attr("href","{kwik}");setTimeout(function(){{window.location="{kwik}"}},{delay});</script>
+<script src="https://pahe.win/js/ads.js"></script>
+</body>
+</html>
+"""
+
+FANSUBS = ["SubsPlease", "Erai-raws", "Judas", "Yameii", "ASW", "DKB"]
+
+
+def _token(rng, length):
+    return "".join(rng.choices(string.ascii_letters + string.digits, k=length))
+
+
+def play_page(rng, title, episode, dub, entity_hrefs):
+    anime_id = f"{_token(rng, 8)}-{_token(rng, 4)}"
+    fansub = rng.choice(FANSUBS)
+    downloads = []
+    resolutions = []
+    for audio in (["jpn", "eng"] if dub else ["jpn"]):
+        for quality, size in (("360p", rng.randint(40, 90)), ("720p", rng.randint(90, 200)), ("1080p", rng.randint(200, 500))):
+            href = f"https://pahe.win/{_token(rng, 5)}"
+            if entity_hrefs:
+                href += "?ref=play&amp;q=" + quality
+            badge = ' <span class="badge badge-warning text-uppercase">eng</span>' if audio == "eng" else ""
+            downloads.append(
+                f'<a href="{href}" class="dropdown-item" target="_blank">{fansub} &middot; {quality} ({size}MB)'
+                f' <span class="badge badge-primary font-weight-normal">BD</span>{badge}</a>'
+            )
+            resolutions.append(
+                f'<button data-src="https://kwik.cx/e/{_token(rng, 12)}" data-fansub="{fansub}" '
+                f'data-resolution="{quality[:-1]}" data-audio="{audio}" class="dropdown-item">{fansub} &middot; {quality}</button>'
+            )
+    episodes = "\n".join(
+        f'<a class="dropdown-item{" active" if n == episode else ""}" href="/play/{anime_id}/{_token(rng, 40)}">Episode {n}</a>'
+        for n in range(1, rng.randint(12, 220))
+    )
+    nav = "".join(f'<li class="nav-item"><a class="nav-link" href="/{item}">{item.title()}</a></li>'
+                  for item in ("anime", "queue", "schedule", "donate"))
+    comments = "\n".join(f"<p class=\"comment\">{_token(rng, 60)} 720p?</p>" for _ in range(rng.randint(5, 60)))
+    return PLAY_PAGE.format(
+        title=title, episode=episode, session=_token(rng, 40), anime_id=anime_id, nav=nav,
+        episodes=episodes, resolutions="\n".join(resolutions), downloads="\n".join(downloads),
+        comments=comments,
+    )
+
+
+def win_page(rng):
+    return WIN_PAGE.format(
+        tag=f"{rng.randrange(16 ** 4):04x}", noise=_token(rng, 30),
+        kwik=f"https://kwik.cx/f/{_token(rng, 12)}", delay=rng.randint(3000, 6000),
+    )
+
+
+PLAY_FIXTURES = {
+    # name: (title, episode, has dub, entity-escaped hrefs, seed)
+    "play_short_series": ("Frieren: Beyond Journey's End", 7, False, False, 1),
+    "play_dubbed": ("Jujutsu Kaisen", 24, True, False, 2),
+    "play_long_series": ("One Piece", 1100, True, True, 3),
+}
+WIN_FIXTURES = {"win_a": 11, "win_b": 12}
+
+
+def main():
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for name, (title, episode, dub, entity_hrefs, seed) in PLAY_FIXTURES.items():
+        page = play_page(random.Random(seed), title, episode, dub, entity_hrefs)
+        with open(os.path.join(FIXTURE_DIR, f"{name}.html"), "w") as f:
+            f.write(page)
+        print(f"✅ {name}: {len(page)} bytes")
+    for name, seed in WIN_FIXTURES.items():
+        page = win_page(random.Random(seed))
+        with open(os.path.join(FIXTURE_DIR, f"{name}.html"), "w") as f:
+            f.write(page)
+        print(f"✅ {name}: {len(page)} bytes")
+
+
+if __name__ == "__main__":
+    main()
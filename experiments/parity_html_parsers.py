@@ -0,0 +1,103 @@
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from helpers.anime_helper import (
+    _parse_pahewin_html, _parse_pahewin_html_soup,
+    _parse_kiwi_url, _parse_kiwi_url_soup,
+)
+from utils.html_scan import ScanError, script_texts
+
+# Parity suite for the fast HTML extractors: on every saved page, and on
+# variants of them with markup the scanners must handle (or hand over to
+# BeautifulSoup), the fast path must give exactly what the BeautifulSoup
+# version gives.
+#
+#   python experiments/parity_html_parsers.py
+#
+# Fixtures come from experiments/make_pahe_fixtures.py and
+# experiments/make_kwik_fixtures.py.
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# (name, transform) applied to every saved page
+VARIANTS = [
+    ("as saved", lambda page: page),
+    ("upper-case tags", lambda page: page.replace("<a ", "<A ").replace("</a>", "</A>").replace("<script", "<SCRIPT")),
+    ("single-quoted attributes", lambda page: page.replace('class="dropdown-item"', "class='dropdown-item'")),
+    ("extra classes", lambda page: page.replace('class="dropdown-item"', 'class="dropdown-item  text-truncate"')),
+    ("fake dropdown in a comment", lambda page: page.replace("<body>", '<body><!-- <div id="pickDownload"><a class="dropdown-item" href="x">720p</a></div> -->')),
+    ("fake dropdown in a script", lambda page: page.replace("<body>", '<body><script>var s = \'<div id="pickDownload"><a class="dropdown-item" href="y">720p</a></div>\';</script>')),
+    ("script inside the dropdown", lambda page: page.replace('id="pickDownload" class="dropdown-menu dropdown-menu-right" aria-labelledby="downloadMenu">', 'id="pickDownload" class="dropdown-menu dropdown-menu-right" aria-labelledby="downloadMenu"><script>var z=1;</script>')),
+    ("unclosed anchor", lambda page: page.replace("</a>\n</DIV>", "\n</DIV>")),
+    ("no dropdown", lambda page: page.replace("pickDownload", "pickStream")),
+    ("self-closing script first", lambda page: page.replace("<body>", '<body><script src="/x.js" />')),
+    ("script end tag with space", lambda page: page.replace("</script>", "</script >")),
+    ("comment before scripts", lambda page: page.replace("<body>", "<body><!-- <script>var fake='https://kwik.cx/f/fake';</script> -->")),
+]
+
+
+def soup_scripts(page):
+    return [script.text for script in BeautifulSoup(page, "html.parser").find_all("script")]
+
+
+def fast_scripts(page):
+    try:
+        return script_texts(page)
+    except ScanError:
+        return soup_scripts(page)
+
+
+CHECKS = [
+    # (name, fast, reference)
+    ("pahe dropdown link", lambda page: _parse_pahewin_html(page, ""), lambda page: _parse_pahewin_html_soup(page, "")),
+    ("pahe.win kwik link", _parse_kiwi_url, _parse_kiwi_url_soup),
+    ("script bodies", fast_scripts, soup_scripts),
+]
+
+
+def outcome(fn, page):
+    try:
+        return fn(page)
+    except Exception as e:
+        return type(e).__name__
+
+
+def main():
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*", "*.html"))):
+        with open(path) as f:
+            pages[os.path.relpath(path, FIXTURE_DIR)] = f.read()
+    if not pages:
+        print("❌ No fixtures, run experiments/make_pahe_fixtures.py and make_kwik_fixtures.py first")
+        sys.exit(1)
+
+    # The fixtures print "No link found" / fallback notes; keep the report readable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    failures = []
+    runs = 0
+    try:
+        for name, page in pages.items():
+            for variant, transform in VARIANTS:
+                varied = transform(page)
+                for check, fast, reference in CHECKS:
+                    runs += 1
+                    got, expected = outcome(fast, varied), outcome(reference, varied)
+                    if got != expected:
+                        failures.append(f"{name} [{variant}] {check}: fast={got!r:.80} soup={expected!r:.80}")
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    print(f"{'❌' if failures else '✅'} {runs - len(failures)}/{runs} checks match BeautifulSoup "
+          f"({len(pages)} pages x {len(VARIANTS)} variants)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import asyncpg
+from datetime import datetime
+import database
+from helpers.geoip import geoip
+from helpers.analytics_rollup import apply_rollups
+
+# /analytics/track only validates an event and queues it. A single flusher
+# task drains the queue in batches (size or time trigger), fills in countries
+# from the offline GeoIP tables and writes the batch with one COPY, so request
+# handlers never hold a Postgres connection. The rollups behind
+# /analytics/stats are updated in the same transaction.
+
+BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "500"))
+FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "2"))
+# Events beyond this are rejected instead of growing memory without bound
+MAX_PENDING = int(os.getenv("ANALYTICS_MAX_PENDING", "10000"))
+
+COLUMNS = (
+    "event_type", "anime_title", "episode_count", "total_size", "from_episode",
+    "to_episode", "timestamp", "ip_address", "user_agent", "country",
+)
+
+
+def _text(value, limit=None):
+    if value is None:
+        return None
+    value = str(value)
+    return value[:limit] if limit else value
+
+
+# Errors caused by the data of some row, as opposed to the connection
+ROW_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError)
+
+# analytics integer columns are INTEGER (int4)
+INT_MIN, INT_MAX = -2**31, 2**31 - 1
+
+
+def _int(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value} is not a whole number")
+    value = int(value)
+    if not INT_MIN <= value <= INT_MAX:
+        raise ValueError(f"{value} is out of range")
+    return value
+
+
+def make_event(body, ip_address, user_agent):
+    """Row for the analytics table (country filled in at flush); ValueError if malformed"""
+    # One bad row would fail the whole COPY, so reject it here
+    if not body.get("event_type"):
+        raise ValueError("Invalid event: event_type is required")
+    try:
+        return {
+            "event_type": _text(body.get("event_type"), 50),
+            "anime_title": _text(body.get("anime_title"), 255),
+            "episode_count": _int(body.get("episode_count")),
+            "total_size": _text(body.get("total_size"), 50),
+            "from_episode": _int(body.get("from_episode")),
+            "to_episode": _int(body.get("to_episode")),
+            "timestamp": datetime.now(),
+            "ip_address": _text(ip_address, 50),
+            "user_agent": _text(user_agent),
+            "country": "Unknown",
+        }
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid event: {e}")
+
+
+class AnalyticsBuffer:
+    def __init__(self):
+        self.queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+        self._stopping = asyncio.Event()
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=MAX_PENDING)
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        print("✅ Analytics buffer started")
+
+    async def stop(self):
+        """Flush everything still queued, then stop the flusher"""
+        if not self._task:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        print(f"🔌 Analytics buffer flushed ({self.written} events written)")
+
+    def submit(self, event):
+        """Queue an event; False when the buffer is full or shutting down"""
+        if self.queue is None or self._stopping.is_set():
+            self.rejected += 1
+            return False
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def _run(self):
+        while not (self._stopping.is_set() and self.queue.empty()):
+            batch = await self._collect()
+            if batch:
+                await self._write(batch)
+
+    async def _collect(self):
+        # Wait for a first event, then keep filling until full or the interval ends
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = loop.time() + FLUSH_INTERVAL
+        while len(batch) < BATCH_SIZE:
+            if self._stopping.is_set() and self.queue.empty():
+                break
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, batch):
+        for event in batch:
+            event["country"] = geoip.lookup(event["ip_address"])
+        try:
+            await self._copy(batch)
+        except ROW_ERRORS as e:
+            print(f"⚠️ Analytics batch of {len(batch)} failed ({e}), isolating bad rows...")
+            await self._write_split(batch)
+            return
+        except Exception as e:
+            # Connection-level failure: retrying row by row would not help
+            self.failed += len(batch)
+            print(f"❌ Analytics flush failed, dropped {len(batch)} events: {e}")
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    async def _copy(self, events):
+        records = [tuple(event[c] for c in COLUMNS) for event in events]
+        async with database.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table("analytics", records=records, columns=COLUMNS)
+                await apply_rollups(conn, events)
+
+    async def _write_split(self, events):
+        # Bisect a failed batch so only the offending rows are dropped
+        if len(events) == 1:
+            self.failed += 1
+            print(f"❌ Dropped analytics event {events[0]['event_type']!r}: rejected by Postgres")
+            return
+        middle = len(events) // 2
+        for half in (events[:middle], events[middle:]):
+            try:
+                await self._copy(half)
+            except ROW_ERRORS:
+                await self._write_split(half)
+                continue
+            self.written += len(half)
+            self.batches += 1
+
+    def stats(self):
+        return {
+            "pending": self.queue.qsize() if self.queue else 0,
+            "max_pending": MAX_PENDING,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch": round(self.written / self.batches, 1) if self.batches else 0.0,
+        }
+
+
+analytics_buffer = AnalyticsBuffer()
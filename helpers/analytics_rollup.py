@@ -0,0 +1,194 @@
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import database
+
+# Rollups of the raw analytics table, kept up to date by the batch writer in
+# the same transaction as each COPY:
+#   analytics_hourly           events/episodes per hour and event type
+#   analytics_daily_titles     events/episodes per day, event type and title
+#   analytics_daily_ranges     distinct download ranges per day and title
+#   analytics_daily_countries  events per day and country
+# /analytics/stats reads only these, so its cost follows the window length,
+# not the size of the raw table.
+
+STATS_TTL = float(os.getenv("ANALYTICS_STATS_TTL", "30"))
+
+_stats_cache: dict[int, tuple] = {}
+
+
+def _hour(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _range(event):
+    # Same text as CONCAT(from_episode::text, '-', to_episode::text)
+    low, high = event["from_episode"], event["to_episode"]
+    return f"{'' if low is None else low}-{'' if high is None else high}"
+
+
+async def apply_rollups(conn, events):
+    """Fold a batch of analytics events into the rollup tables"""
+    hourly = defaultdict(lambda: [0, 0])
+    titles = defaultdict(lambda: [0, 0])
+    ranges = set()
+    countries = defaultdict(int)
+    for e in events:
+        day = e["timestamp"].date()
+        episodes = e["episode_count"] or 0
+        bucket = hourly[(_hour(e["timestamp"]), e["event_type"])]
+        bucket[0] += 1
+        bucket[1] += episodes
+        if e["anime_title"] is not None:
+            bucket = titles[(day, e["event_type"], e["anime_title"])]
+            bucket[0] += 1
+            bucket[1] += episodes
+            if e["event_type"] == "download":
+                ranges.add((day, e["anime_title"], _range(e)))
+        countries[(day, e["country"])] += 1
+
+    await conn.executemany("""
+        INSERT INTO analytics_hourly (bucket, event_type, events, episodes)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (bucket, event_type) DO UPDATE SET
+            events = analytics_hourly.events + excluded.events,
+            episodes = analytics_hourly.episodes + excluded.episodes
+    """, [(*key, *value) for key, value in hourly.items()])
+    await conn.executemany("""
+        INSERT INTO analytics_daily_titles (day, event_type, anime_title, events, episodes)
+        VALUES ($1, $2, $3, $4, $5)
+        ON CONFLICT (day, event_type, anime_title) DO UPDATE SET
+            events = analytics_daily_titles.events + excluded.events,
+            episodes = analytics_daily_titles.episodes + excluded.episodes
+    """, [(*key, *value) for key, value in titles.items()])
+    await conn.executemany("""
+        INSERT INTO analytics_daily_ranges (day, anime_title, episode_range)
+        VALUES ($1, $2, $3)
+        ON CONFLICT DO NOTHING
+    """, list(ranges))
+    await conn.executemany("""
+        INSERT INTO analytics_daily_countries (day, country, events)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (day, country) DO UPDATE SET
+            events = analytics_daily_countries.events + excluded.events
+    """, [(*key, value) for key, value in countries.items()])
+
+
+async def backfill_rollups():
+    """Build the rollups from raw events once, when they are still empty"""
+    async with database.pool.acquire() as conn:
+        await _backfill(conn)
+
+
+async def _backfill(conn):
+    if await conn.fetchval("SELECT EXISTS (SELECT 1 FROM analytics_hourly)"):
+        return
+    if not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM analytics)"):
+        return
+    print("📋 Backfilling analytics rollups...")
+    async with conn.transaction():
+        await conn.execute("""
+            INSERT INTO analytics_hourly (bucket, event_type, events, episodes)
+            SELECT date_trunc('hour', timestamp), event_type, COUNT(*), COALESCE(SUM(episode_count), 0)
+            FROM analytics GROUP BY 1, 2
+        """)
+        await conn.execute("""
+            INSERT INTO analytics_daily_titles (day, event_type, anime_title, events, episodes)
+            SELECT DATE(timestamp), event_type, anime_title, COUNT(*), COALESCE(SUM(episode_count), 0)
+            FROM analytics WHERE anime_title IS NOT NULL GROUP BY 1, 2, 3
+        """)
+        await conn.execute("""
+            INSERT INTO analytics_daily_ranges (day, anime_title, episode_range)
+            SELECT DISTINCT DATE(timestamp), anime_title, CONCAT(from_episode::text, '-', to_episode::text)
+            FROM analytics WHERE event_type = 'download' AND anime_title IS NOT NULL
+        """)
+        await conn.execute("""
+            INSERT INTO analytics_daily_countries (day, country, events)
+            SELECT DATE(timestamp), country, COUNT(*)
+            FROM analytics WHERE country IS NOT NULL GROUP BY 1, 2
+        """)
+    print("✅ Analytics rollups backfilled")
+
+
+async def _query_stats(conn, days):
+    start_date = datetime.now() - timedelta(days=days)
+    start_hour = _hour(start_date)
+    start_day = start_date.date()
+
+    totals = await conn.fetchrow("""
+        SELECT
+            COALESCE(SUM(events) FILTER (WHERE event_type = 'visit'), 0)::bigint AS total_visits,
+            COALESCE(SUM(events) FILTER (WHERE event_type = 'search'), 0)::bigint AS total_searches,
+            COALESCE(SUM(events) FILTER (WHERE event_type = 'download'), 0)::bigint AS total_downloads,
+            COALESCE(SUM(episodes) FILTER (WHERE event_type = 'download'), 0)::bigint AS total_episodes
+        FROM analytics_hourly
+        WHERE bucket >= $1
+    """, start_hour)
+
+    top_searches_rows = await conn.fetch("""
+        SELECT anime_title, SUM(events)::bigint as count
+        FROM analytics_daily_titles
+        WHERE event_type = 'search' AND day >= $1
+        GROUP BY anime_title
+        ORDER BY count DESC
+        LIMIT 10
+    """, start_day)
+
+    top_downloads_rows = await conn.fetch("""
+        SELECT
+            t.anime_title,
+            t.download_count,
+            t.total_episodes,
+            (SELECT string_agg(DISTINCT r.episode_range, ', ')
+             FROM analytics_daily_ranges r
+             WHERE r.anime_title = t.anime_title AND r.day >= $1) as episode_ranges
+        FROM (
+            SELECT anime_title, SUM(events)::bigint as download_count, SUM(episodes)::bigint as total_episodes
+            FROM analytics_daily_titles
+            WHERE event_type = 'download' AND day >= $1
+            GROUP BY anime_title
+            ORDER BY download_count DESC
+            LIMIT 10
+        ) t
+        ORDER BY t.download_count DESC
+    """, start_day)
+
+    daily_visits_rows = await conn.fetch("""
+        SELECT DATE(bucket) as date, SUM(events)::bigint as visits
+        FROM analytics_hourly
+        WHERE event_type = 'visit' AND bucket >= $1
+        GROUP BY DATE(bucket)
+        ORDER BY date ASC
+    """, start_hour)
+
+    top_countries_rows = await conn.fetch("""
+        SELECT country, SUM(events)::bigint as count
+        FROM analytics_daily_countries
+        WHERE day >= $1 AND country != 'Unknown'
+        GROUP BY country
+        ORDER BY count DESC
+        LIMIT 10
+    """, start_day)
+
+    return {
+        "period_days": days,
+        **dict(totals),
+        "top_searches": [dict(row) for row in top_searches_rows],
+        "top_downloads": [dict(row) for row in top_downloads_rows],
+        "daily_visits": [dict(row) for row in daily_visits_rows],
+        "top_countries": [dict(row) for row in top_countries_rows],
+    }
+
+
+async def get_stats(days):
+    """Stats for the last `days` days, cached for STATS_TTL seconds"""
+    cached = _stats_cache.get(days)
+    if cached and time.time() - cached[0] < STATS_TTL:
+        return cached[1]
+    async with database.pool.acquire() as conn:
+        stats = await _query_stats(conn, days)
+    if len(_stats_cache) > 64:
+        _stats_cache.clear()
+    _stats_cache[days] = (time.time(), stats)
+    return stats
@@ -3,114 +3,28 @@ import asyncio
 import time
 import os
 import re
+import traceback
 from bs4 import BeautifulSoup
 import httpx
-from playwright.async_api import async_playwright,TimeoutError
 from utils.helper import deobfuscate,extract_info
+from utils.html_scan import ScanError, dropdown_links, first_kwik_url, script_texts
+from helpers.http_client import get_client
+from helpers.cookie_cache import get_animepahe_cookies
+from helpers.episode_index import episode_index
+from helpers.link_cache import link_cache
+from helpers.executors import run_in
 
-async def cookies_expired(db):
-    """Check if __ddg2 cookie is expired"""
-    now = time.time()
-    
-    cursor = await db.execute(
-        "SELECT value, expires FROM cookies WHERE name = ?", 
-        ("__ddg2",)
-    )
-    row = await cursor.fetchone()
-    
-    if not row:
-        print(f"❌ __ddg2 cookie missing from database")
-        return True
-    
-    exp = row["expires"]
-    if not exp:
-        print(f"❌ __ddg2 has no expiry field")
-        return True
-    
-    is_expired = exp < now
-    return is_expired
-
-
-async def get_animepahe_cookies(db):
-    """Get cookies from SQLite database, refresh if expired"""
-    
-    # 1️⃣ Check if cached cookies exist and are still valid
-    cursor = await db.execute("SELECT COUNT(*) as count FROM cookies")
-    row = await cursor.fetchone()
-    
-    if row["count"] > 0:
-        if not await cookies_expired(db):
-            
-            # Fetch all cookies
-            cursor = await db.execute("SELECT name, value FROM cookies")
-            rows = await cursor.fetchall()
-            return {row["name"]: row["value"] for row in rows}
-        else:
-            print("⚠️ Cookies expired, fetching new ones...")
-    
-    # 2️⃣ Cookies expired or don't exist - use Playwright
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            
-            # Go to Animepahe
-            await page.goto("https://animepahe.si")
-            
-            # Wait for main content to load
-            try:
-                await page.wait_for_load_state("domcontentloaded", timeout=10000)
-            except TimeoutError:
-                print("⚠️ Timeout waiting for DOMContentLoaded, continuing anyway...")
-            
-            # Small sleep to ensure cookies are set
-            await asyncio.sleep(1)
-            
-            cookies = await context.cookies()
-            await browser.close()
-            
-            # Clear old cookies and insert new ones
-            await db.execute("DELETE FROM cookies")
-            
-            for cookie in cookies:
-                await db.execute(
-                    "INSERT INTO cookies (name, value, expires) VALUES (?, ?, ?)",
-                    (cookie['name'], cookie['value'], cookie.get('expires'))
-                )
-            
-            await db.commit()
-            
-            print("✅ Used fresh cookies from animepahe server")
-            
-            # Return cookies as dict
-            return {c['name']: c['value'] for c in cookies}
-            
-    except Exception as e:
-        print(f"❌ Failed to get new cookies: {e}")
-        
-        # Fallback: return cached cookies even if expired (better than nothing)
-        cursor = await db.execute("SELECT name, value FROM cookies")
-        rows = await cursor.fetchall()
-        
-        if rows:
-            print("⚠️ Using expired cached cookies as fallback")
-            return {row["name"]: row["value"] for row in rows}
-        
-        return None  # No cookies available at all
-
-async def get_actual_episode(external_id,db):
+async def get_actual_episode(external_id):
     try:
         if not external_id:
             return None
-        cookies = await get_animepahe_cookies(db)
+        await get_animepahe_cookies()
         
-        async with httpx.AsyncClient() as client:
-            res = await client.get(
-                f"https://animepahe.si/api?m=release&id={external_id}",
-                cookies=cookies,
-                timeout=30
-            )
+        client = get_client("animepahe")
+        res = await client.get(
+            f"https://animepahe.si/api?m=release&id={external_id}",
+            timeout=30
+        )
         if res.status_code != 200:
             return None
         data = res.json()
@@ -143,7 +57,7 @@ async def get_cached_anime_info(id, db):
             return {"status": 400, "message": "No external_id found for this anime"}
         
         # Get actual episode count
-        episodes = await get_actual_episode(external_id,db)
+        episodes = await get_actual_episode(external_id)
         
         if not episodes:
             return {"status": 500, "message": "Failed to fetch episode count"}
@@ -166,80 +80,57 @@ async def get_cached_anime_info(id, db):
         traceback.print_exc()
         return {"status": 500, "message": f"Internal error: {str(e)}"}
 
-async def get_episode_session(id, db):
+async def get_episode_session(id, episode=None):
+    """Episodes in release order from the persistent episode index"""
     if not id:
         return None
-    
-    cookies = await get_animepahe_cookies(db)
-    
-    cursor = await db.execute(
-        "SELECT page_count FROM anime_episode WHERE external_id = ?", (id,))
-    row = await cursor.fetchone()
-    
-    if not row or not row["page_count"]:
-        async with httpx.AsyncClient(cookies=cookies, timeout=10) as client:
-            res = await client.get(f"https://animepahe.si/api?m=release&id={id}")
-            data = res.json()
-        
-        if not data or not data.get("last_page"):
-            return None
+    return await episode_index.get(id, episode)
 
-        await db.execute(
-    "INSERT OR IGNORE INTO anime_episode(episode, external_id, page_count) VALUES (?, ?, ?)",
-    (data.get("total"), id, data.get("last_page"))
-)
 
-        await db.commit()
-        page_count = data.get("last_page")
-    else:
-        page_count = row["page_count"]
-    
-    
-    async def fetch_page(client, page, delay):
-        # Stagger requests with delay
-        await asyncio.sleep(delay)
-        
-        url = (
-            f"https://animepahe.si/api"
-            f"?m=release&id={id}&sort=episode_asc&page={page}"
-        )
-        res = await client.get(url, cookies=cookies)
-        return res.json().get("data", [])
-    
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        # Create tasks with staggered delays (0.5s between each)
-        tasks = [
-            fetch_page(client, page, page * 0.5)
-            for page in range(1, page_count + 1)
-        ]
-        
-        # Fetch all pages concurrently
-        results = await asyncio.gather(*tasks)
-    
-    # Flatten the results
-    episode_result = [episode for page_data in results for episode in page_data]
-    
-    return episode_result
+async def get_episode_range(id, start, end=None):
+    """Episodes start..end, fetching only the release pages that hold them"""
+    if not id:
+        return None
+    return await episode_index.lookup(id, start, end)
     
-async def get_pahewin_link(external_id, episode_id,db):
+async def get_pahewin_link(external_id, episode_id):
     if not episode_id or not external_id:
         return None
     
     url = f"https://animepahe.si/play/{external_id}/{episode_id}"
-    cookies = await get_animepahe_cookies(db)
+    await get_animepahe_cookies()
     
-    # Use httpx for async HTTP request
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url, cookies=cookies, timeout=10)
-        html = res.text
+    # Shared animepahe client (keep-alive + cookie jar)
+    client = get_client("animepahe")
+    res = await client.get(url, timeout=10)
+    html = res.text
     
-    # Offload BeautifulSoup parsing to thread pool
-    link = await asyncio.to_thread(_parse_pahewin_html, html, url)
+    # Offload HTML parsing to the parse worker processes
+    link = await run_in("parse", _parse_pahewin_html, html, url)
     return link
 
 
 def _parse_pahewin_html(html, url):
-    """Synchronous HTML parsing - runs in thread pool"""
+    """Synchronous HTML parsing - runs in a parse worker"""
+    try:
+        links = dropdown_links(html)
+    except ScanError as e:
+        print(f"⚠️ Fast pahe parser gave up ({e}), using BeautifulSoup")
+        return _parse_pahewin_html_soup(html, url)
+    if links is None:
+        return None
+
+    for href, text in links:
+        text = text.lower()
+        if "720p" in text and "eng" not in text:
+            return href
+
+    print("No link found")
+    return None
+
+
+def _parse_pahewin_html_soup(html, url):
+    """BeautifulSoup fallback for _parse_pahewin_html"""
     soup = BeautifulSoup(html, "html.parser")
     dropdown = soup.find("div", id="pickDownload")
     if not dropdown:
@@ -265,17 +156,26 @@ async def get_kiwi_url(pahe_url):
         "Accept": "*/*"
     }
 
-    # Async HTTP request with httpx
-    async with httpx.AsyncClient() as client:
-        res = await client.get(pahe_url, timeout=10, headers=headers)
-        html = res.text
+    # Shared pahe.win client
+    client = get_client("pahe")
+    res = await client.get(pahe_url, timeout=10, headers=headers)
+    html = res.text
     
-    # Offload BeautifulSoup parsing to thread pool
-    return await asyncio.to_thread(_parse_kiwi_url, html)
+    # Offload HTML parsing to the parse worker processes
+    return await run_in("parse", _parse_kiwi_url, html)
 
 
 def _parse_kiwi_url(html):
-    """Synchronous HTML parsing - runs in thread pool"""
+    """Synchronous HTML parsing - runs in a parse worker"""
+    try:
+        return first_kwik_url(html)
+    except ScanError as e:
+        print(f"⚠️ Fast pahe.win parser gave up ({e}), using BeautifulSoup")
+        return _parse_kiwi_url_soup(html)
+
+
+def _parse_kiwi_url_soup(html):
+    """BeautifulSoup fallback for _parse_kiwi_url"""
     soup = BeautifulSoup(html, "html.parser")
     info = soup.find("script")
     if not info or "kwik" not in info.text:
@@ -293,7 +193,6 @@ async def get_kiwi_info(kiwi_url):
             'Accept-Language': 'en-US,en;q=0.9',
             'Accept-Encoding': 'gzip, deflate',
             'DNT': '1',
-            'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Sec-Fetch-Dest': 'document',
             'Sec-Fetch-Mode': 'navigate',
@@ -303,14 +202,14 @@ async def get_kiwi_info(kiwi_url):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/131 Safari/537.36',
         }
 
-        # Async HTTP request with httpx
-        async with httpx.AsyncClient() as client:
-            res = await client.get(kiwi_url, timeout=10, headers=headers)
-            html = res.text
-            cookies = res.cookies
+        # Shared kwik client, session cookie is read from this response only
+        client = get_client("kwik")
+        res = await client.get(kiwi_url, timeout=10, headers=headers)
+        html = res.text
+        kwik_session = res.cookies.get("kwik_session")
         
-        # Offload CPU-bound parsing/deobfuscation to thread pool
-        result = await asyncio.to_thread(_parse_and_deobfuscate_kiwi, html, cookies)
+        # Offload CPU-bound parsing/deobfuscation to the parse worker processes
+        result = await run_in("parse", _parse_and_deobfuscate_kiwi, html, kwik_session)
         return result
         
     except IndexError:
@@ -322,18 +221,60 @@ async def get_kiwi_info(kiwi_url):
         traceback.print_exc()
         return None
 
-def _parse_and_deobfuscate_kiwi(html, cookies):
-    """Synchronous parsing and deobfuscation - runs in thread pool"""
-    html_soup = BeautifulSoup(html, "html.parser")
-    scripts = html_soup.find_all("script")
-    obf_js = scripts[-3].text
+def _kwik_scripts(html):
+    try:
+        return script_texts(html)
+    except ScanError as e:
+        print(f"⚠️ Fast kwik parser gave up ({e}), using BeautifulSoup")
+        return [script.text for script in BeautifulSoup(html, "html.parser").find_all("script")]
+
+
+def _parse_and_deobfuscate_kiwi(html, kwik_session):
+    """Synchronous parsing and deobfuscation - runs in a parse worker"""
+    scripts = _kwik_scripts(html)
+    obf_js = scripts[-3]
     deobf_js = deobfuscate(obf_js)
     
     return {
         **extract_info(deobf_js),
-        "kwik_session": cookies.get("kwik_session")
+        "kwik_session": kwik_session
     }
 
+async def get_direct_link(url, info):
+    """Exchange a kwik url + token/session for the CDN download link"""
+    base_url = "https://kwik-test.vercel.app/kwik"
+    # base_url = "http://localhost:5000/kwik"
+    payload = {
+        "kwik_url": url,
+        "token": info.get("token"),
+        "kwik_session": info.get("kwik_session")
+    }
+    
+    # Shared client for the redirect service
+    client = get_client("kwik_redirect")
+    res = await client.post(
+        base_url,
+        content=json.dumps(payload),
+        timeout=10,
+        headers={"Content-Type": "application/json"}
+    )
+    
+    if res.status_code != 200:
+        print(res.text)
+        return None
+    
+    return res.json().get("download_link")
+
+
+async def save_direct_link(id, episode, direct_link, size, snapshot, db):
+    entry = link_cache.put(id, episode, direct_link, size, snapshot)
+    await db.execute(
+        "INSERT OR REPLACE INTO cached_video_url(internal_id,episode,video_url,size,snapshot,fetched_at,expires_at) VALUES(?,?,?,?,?,?,?)",
+        (id, episode, direct_link, size,snapshot, entry["fetched_at"], entry["expires_at"])
+    )
+    await db.commit()
+
+
 async def get_redirect_link(url, id, episode, db,snapshot):
     if not url or not id or not episode:
         print("No url,episode or id detected ending now")
@@ -346,44 +287,19 @@ async def get_redirect_link(url, id, episode, db,snapshot):
             "message": "Server timed out, retry request"
         }
     
-    base_url = "https://kwik-test.vercel.app/kwik"
-    # base_url = "http://localhost:5000/kwik"
-    payload = {
-        "kwik_url": url,
-        "token": info.get("token"),
-        "kwik_session": info.get("kwik_session")
-    }
-    
-    # Async HTTP POST with httpx
-    async with httpx.AsyncClient() as client:
-        res = await client.post(
-            base_url,
-            content=json.dumps(payload),
-            timeout=10,
-            headers={"Content-Type": "application/json"}
-        )
-    
-    if res.status_code != 200:
-        print(res.text)
+    direct_link = await get_direct_link(url, info)
+    if not direct_link:
         return {
             "status": 500,
             "message": "Server timed out"
         }
     
-    data = res.json()
     size = info.get("size")
-    direct_link = data.get("download_link")
-    
-    # Async database operations
-    await db.execute(
-        "INSERT OR REPLACE INTO cached_video_url(internal_id,episode,video_url,size,snapshot) VALUES(?,?,?,?,?)",
-        (id, episode, direct_link, size,snapshot)
-    )
-    await db.commit()
+    await save_direct_link(id, episode, direct_link, size, snapshot, db)
     return {
         "direct_link": direct_link,
         "episode": episode,
         "snapshot": snapshot,
         "status": 200,
         "size": size
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from playwright.async_api import async_playwright,TimeoutError
+import db as cache_db
+from helpers.http_client import set_cookies
+
+# Start a background refresh this many seconds before __ddg2 expires
+REFRESH_AHEAD = 120
+# After a failed refresh, serve stale cookies for this long before retrying
+RETRY_AFTER = 30
+
+
+async def _fetch_fresh_cookies():
+    """Launch headless Chromium and collect animepahe cookies"""
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context()
+        page = await context.new_page()
+
+        # Go to Animepahe
+        await page.goto("https://animepahe.si")
+
+        # Wait for main content to load
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=10000)
+        except TimeoutError:
+            print("⚠️ Timeout waiting for DOMContentLoaded, continuing anyway...")
+
+        # Small sleep to ensure cookies are set
+        await asyncio.sleep(1)
+
+        cookies = await context.cookies()
+        await browser.close()
+        return cookies
+
+
+def _ddg2_expiry(cookies):
+    for cookie in cookies:
+        if cookie["name"] == "__ddg2":
+            return cookie.get("expires") or None
+    return None
+
+
+class CookieCache:
+    """
+    Parsed animepahe cookies kept in memory.
+    SQLite is only read on first use and written after a refresh, so cookies
+    survive restarts. At most one Chromium refresh runs at a time.
+    """
+
+    def __init__(self):
+        self.cookies: dict = None
+        self.expires: float = None
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task = None
+        self._retry_at = 0.0
+
+    async def load(self):
+        """Load persisted cookies from SQLite (once)"""
+        async with self._load_lock:
+            if self._loaded or not cache_db.pool:
+                return
+            async with cache_db.pool.connection() as db:
+                cursor = await db.execute("SELECT name, value, expires FROM cookies")
+                rows = await cursor.fetchall()
+            if rows:
+                self._set([dict(row) for row in rows])
+            self._loaded = True
+
+    def _set(self, cookies):
+        self.cookies = {c["name"]: c["value"] for c in cookies}
+        self.expires = _ddg2_expiry(cookies)
+        set_cookies(self.cookies, "animepahe.si")
+
+    def is_valid(self):
+        return bool(self.cookies) and bool(self.expires) and self.expires > time.time()
+
+    async def get(self):
+        if not self._loaded:
+            await self.load()
+
+        now = time.time()
+        if self.is_valid():
+            if self.expires - now < REFRESH_AHEAD:
+                self._start_refresh()
+            return self.cookies
+
+        if self.cookies and now < self._retry_at:
+            # Last refresh failed recently, don't relaunch Chromium yet
+            return self.cookies
+
+        # Shield so a cancelled request doesn't cancel the shared refresh
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    async def _refresh(self):
+        print("⚠️ Cookies expired or expiring, fetching new ones...")
+        try:
+            cookies = await _fetch_fresh_cookies()
+        except Exception as e:
+            print(f"❌ Failed to get new cookies: {e}")
+            self._retry_at = time.time() + RETRY_AFTER
+            if self.cookies:
+                # Fallback: expired cookies are better than nothing
+                print("⚠️ Using expired cached cookies as fallback")
+            return self.cookies
+
+        self._set(cookies)
+        await self._persist(cookies)
+        print("✅ Used fresh cookies from animepahe server")
+        return self.cookies
+
+    async def _persist(self, cookies):
+        if not cache_db.pool:
+            return
+        try:
+            async with cache_db.pool.connection() as db:
+                # Clear old cookies and insert new ones
+                await db.execute("DELETE FROM cookies")
+                await db.executemany(
+                    "INSERT INTO cookies (name, value, expires) VALUES (?, ?, ?)",
+                    [(c["name"], c["value"], c.get("expires")) for c in cookies]
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"⚠️ Failed to persist cookies: {e}")
+
+
+cookie_cache = CookieCache()
+
+
+async def get_animepahe_cookies():
+    """Get animepahe cookies from memory, refreshing them if expired"""
+    return await cookie_cache.get()
@@ -4,19 +4,37 @@ import re
 import secrets
 from datetime import datetime
 import asyncio
+import httpx
 import yt_dlp
+from yt_dlp.extractor import gen_extractor_classes
 from yt_dlp.utils import DownloadError
+import db as cache_db
+from helpers.http_client import get_client
+from helpers.video_store import video_store, file_size
+from helpers.executors import run_in
 # from db import get_db
 
-def raw_video_downloader(url):
-    try:
-        os.makedirs("downloads", exist_ok=True)
+# Extractors for the platforms /dl serves, in yt-dlp's own matching order.
+# Their URL patterns give the video ID without any network request.
+_EXTRACTORS = [
+    ie for ie in gen_extractor_classes()
+    if ie.ie_key().startswith(("TikTok", "Youtube", "Facebook", "Instagram"))
+]
+# Extractors whose ID is a short link code, not the video ID
+SHORT_LINK_IES = {"TikTokVM"}
 
-        # Get video info first
-        with yt_dlp.YoutubeDL({"quiet": True}) as yt:
-            info = yt.extract_info(url, download=False)
+# In-flight downloads keyed by (extractor, video id), or ("url", url) when unknown
+_downloads: dict = {}
+
+def _extract_and_download(url, options):
+    """
+    Extract once and download from that same info dict. yt.download([url])
+    would run the extractor (and its page/API requests) a second time.
+    Returns (info, final_path).
+    """
+    with yt_dlp.YoutubeDL(options) as yt:
+        info = yt.extract_info(url, download=False)
 
-        PROJECT_URL = os.getenv('PROJECT_URL')
         title = info.get("title", "video")
 
         # Clean title
@@ -27,19 +45,29 @@ def raw_video_downloader(url):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         final_path = os.path.join("downloads", f"{title}_{timestamp}.mp4")
 
-        # Download directly - force H.264 codec
+        # The output name depends on the title, so it is set after extraction
+        yt.params["outtmpl"]["default"] = final_path
+        info = yt.process_ie_result(info, download=True)
+    return info, final_path
+
+def raw_video_downloader(url, progress_hook=None):
+    try:
+        os.makedirs("downloads", exist_ok=True)
+
+        PROJECT_URL = os.getenv('PROJECT_URL')
+
+        # Force H.264 codec
         options = {
             "format": "bestvideo[vcodec^=avc1]+bestaudio/best",
-            "outtmpl": final_path,
             "quiet": False,
             "nocheckcertificate": True,
             "retries": 10,
             "fragment_retries": 10,
-            "noprogress": True
+            "noprogress": True,
+            "progress_hooks": [progress_hook] if progress_hook else []
         }
-        
-        with yt_dlp.YoutubeDL(options) as yt:
-            yt.download([url])
+
+        info, final_path = _extract_and_download(url, options)
 
         # Generate short code + DB insert
         short_code = secrets.token_urlsafe(6)
@@ -58,7 +86,8 @@ def raw_video_downloader(url):
             },
             "download_url": dlurl+f"/file/{short_code}",
             "short":short_code,
-            "path":final_path
+            "path":final_path,
+            "canonical": (info.get("extractor_key"), info.get("id"))
         }
     except DownloadError as e:
         print("An error occured while downloading",e)
@@ -78,40 +107,26 @@ def raw_video_downloader(url):
             "status":500,
             "message":"Internal Server error"
         }
-def raw_video_downloader_for_insta(url):
+def raw_video_downloader_for_insta(url, progress_hook=None):
     try:
         os.makedirs("downloads", exist_ok=True)
 
-        # Get video info first
-        with yt_dlp.YoutubeDL({"quiet": True}) as yt:
-            info = yt.extract_info(url, download=False)
-
         PROJECT_URL = os.getenv('PROJECT_URL')
-        title = info.get("title", "video")
 
-        # Clean title
-        title = re.sub(r"[^\w\s-]", "", title)
-        title = title.strip().replace(" ", "_")
-        title = title[:40]  # shorten to 40 chars
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        final_path = os.path.join("downloads", f"{title}_{timestamp}.mp4")
-
-        # Download directly - force H.264 codec
+        # Force H.264 codec
         options = {
             "format": "bestvideo[vcodec^=avc1]+bestaudio/best",
-            "outtmpl": final_path,
             "quiet": False,
             "nocheckcertificate": True,
             "retries": 10,
             "cookiesfrombrowser": ("brave",),
             'cookiefile': './insta_cookies.txt',
             "fragment_retries": 10,
-            "noprogress": True
+            "noprogress": True,
+            "progress_hooks": [progress_hook] if progress_hook else []
         }
-        
-        with yt_dlp.YoutubeDL(options) as yt:
-            yt.download([url])
+
+        info, final_path = _extract_and_download(url, options)
 
         # Generate short code + DB insert
         short_code = secrets.token_urlsafe(6)
@@ -130,7 +145,8 @@ def raw_video_downloader_for_insta(url):
             },
             "download_url": dlurl+f"/file/{short_code}",
             "short":short_code,
-            "path":final_path
+            "path":final_path,
+            "canonical": (info.get("extractor_key"), info.get("id"))
         }
     except DownloadError as e:
         print("An error occured while downloading",e)
@@ -151,27 +167,211 @@ def raw_video_downloader_for_insta(url):
             "message":"Internal Server error"
         }
 
-async def videoDL(url,db):
-    info = await asyncio.to_thread(raw_video_downloader,url)
-    if not info or info.get("status") == 500:
-        return info
-    if not info or info.get("status") == 400:
+# Stream mode: a single-file format served over plain HTTP(S), so it can be
+# piped to the client as-is (no DASH/HLS, no merging;
+# "best" already means a format with both video and audio)
+PROGRESSIVE_FORMAT = "best[vcodec^=avc1][protocol^=http]/best[protocol^=http]"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def resolve_stream(url, insta=False):
+    """
+    Extract a video without downloading it. Returns the media URL of a
+    progressive format and the headers (including cookies) yt-dlp would use.
+    """
+    options = {
+        "format": PROGRESSIVE_FORMAT,
+        "quiet": True,
+        "nocheckcertificate": True,
+        "skip_download": True,
+    }
+    if insta:
+        options["cookiefile"] = "./insta_cookies.txt"
+    try:
+        with yt_dlp.YoutubeDL(options) as yt:
+            info = yt.extract_info(url, download=False)
+            headers = dict(info.get("http_headers") or {})
+            cookie = yt.cookiejar.get_cookie_header(info["url"])
+            if cookie:
+                headers["Cookie"] = cookie
+    except DownloadError as e:
+        print("An error occured while resolving stream", e)
+        if "Unsupported URL" in str(e):
+            return {"status": 422, "message": "Unsupported Url"}
+        if "format is not available" in str(e):
+            return {"status": 422, "message": "No progressive format to stream, use the normal mode"}
+        return {"status": 500, "message": "Internal Server error"}
+    except Exception as e:
+        print("Error resolving stream:", e)
+        return {"status": 500, "message": "Internal Server error"}
+
+    title = re.sub(r"[^\w\s-]", "", info.get("title") or "video").strip().replace(" ", "_")[:40]
+    return {
+        "status": 200,
+        "media_url": info["url"],
+        "headers": headers,
+        "filename": f"{title or 'video'}.{info.get('ext') or 'mp4'}",
+    }
+
+
+async def open_stream(url, insta=False, byte_range=None):
+    """
+    Resolve a video and open its media URL as a streamed upstream response.
+    Returns (source, response); response is None when source is an error.
+    """
+    source = await run_in("ytdlp", resolve_stream, url, insta)
+    if source["status"] != 200:
+        return source, None
+    headers = {**source["headers"], "Accept-Encoding": "identity"}
+    if byte_range:
+        headers["Range"] = byte_range
+    client = get_client("media")
+    try:
+        response = await client.send(
+            client.build_request("GET", source["media_url"], headers=headers), stream=True)
+    except httpx.HTTPError as e:
+        print(f"❌ Media upstream failed for {url}: {e}")
+        return {"status": 502, "message": "Upstream media request failed"}, None
+    if response.status_code not in (200, 206):
+        await response.aclose()
+        print(f"❌ Media upstream returned {response.status_code} for {url}")
+        return {"status": 502, "message": f"Upstream returned {response.status_code}"}, None
+    return source, response
+
+
+def _match_canonical(url):
+    for ie in _EXTRACTORS:
+        if ie.suitable(url):
+            return ie.ie_key(), ie.get_temp_id(url)
+    return None
+
+
+async def canonical_key(url):
+    """
+    (extractor, video id) for a URL without extracting it. Short links
+    (vm.tiktok.com, fb.watch...) are followed to the page they redirect to.
+    """
+    # URL regexes only, cheap enough to run inline
+    key = _match_canonical(url)
+    if key and key[0] not in SHORT_LINK_IES and key[1]:
+        return key
+    try:
+        client = get_client("shortlink")
+        res = await client.head(url, timeout=10)
+        if res.status_code >= 400:
+            # Some short link services refuse HEAD
+            async with client.stream("GET", url, timeout=10) as res:
+                pass
+        final_url = str(res.url)
+    except Exception as e:
+        print(f"⚠️ Could not resolve short link {url}: {e}")
+        return None
+    key = _match_canonical(final_url)
+    if key and key[0] not in SHORT_LINK_IES and key[1]:
+        return key
+    return None
+
+
+def _response(row):
+    PROJECT_URL = os.getenv('PROJECT_URL')
+    dlurl = PROJECT_URL if PROJECT_URL else "http://localhost:8000"
+    return {
+        "status": 200,
+        **json.loads(row["info"]),
+        "download_url": dlurl+f"/file/{row['short_code']}",
+        "short": row["short_code"],
+        "path": row["filepath"]
+    }
+
+
+async def _find_downloaded(key, db):
+    cursor = await db.execute(
+        "SELECT short_code, filepath, info FROM videos WHERE extractor = ? AND video_id = ?", key)
+    row = await cursor.fetchone()
+    if row and row["info"] and os.path.exists(row["filepath"]):
+        return row
+    return None
+
+
+async def _download_and_store(url, downloader):
+    info = await run_in("ytdlp", downloader, url)
+    return await store_download(info)
+
+
+async def store_download(info):
+    """Record a finished download in videos; a known video keeps its short code"""
+    if not info or info.get("status") != 200:
         return info
-    await db.execute(
-        "INSERT INTO videos (title, filepath, short_code) VALUES (?, ?, ?)",
-        (info["video_info"]["title"], info["path"], info["short"])
-    )
-    await db.commit()
-    return info
+    key = info.pop("canonical")
+    stored = json.dumps({"channel_info": info["channel_info"], "video_info": info["video_info"]})
+    size = await run_in("blocking_io", file_size, info["path"])
+    now = datetime.now().timestamp()
+    async with cache_db.pool.connection() as db:
+        if not all(key):
+            await db.execute(
+                """
+                INSERT INTO videos (title, filepath, short_code, info, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (info["video_info"]["title"], info["path"], info["short"], stored, size, now, now)
+            )
+            await db.commit()
+            video_store.added(info["short"], info["path"], size)
+            return info
+
+        existing = await _find_downloaded(key, db)
+        if existing:
+            # Same video reached through a URL we could not map up front
+            os.remove(info["path"])
+            video_store.touch(existing["short_code"])
+            return _response(existing)
+        await db.execute(
+            """
+            INSERT INTO videos (title, filepath, short_code, extractor, video_id, info, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(extractor, video_id) WHERE video_id IS NOT NULL DO UPDATE SET
+                title = excluded.title,
+                filepath = excluded.filepath,
+                info = excluded.info,
+                size = excluded.size,
+                created_at = excluded.created_at,
+                last_access = excluded.last_access
+            """,
+            (info["video_info"]["title"], info["path"], info["short"], *key, stored, size, now, now)
+        )
+        # A re-download of a known video keeps its original short code
+        cursor = await db.execute(
+            "SELECT short_code, filepath, info FROM videos WHERE extractor = ? AND video_id = ?", key)
+        row = await cursor.fetchone()
+        await db.commit()
+    video_store.added(row["short_code"], row["filepath"], size)
+    return _response(row)
+
+
+async def _deduplicated_download(url, db, downloader):
+    """
+    Return the stored file for a video already downloaded, otherwise download
+    it. Concurrent requests for the same video share one download.
+    """
+    key = await canonical_key(url)
+    if key:
+        row = await _find_downloaded(key, db)
+        if row:
+            print(f"♻️ {key[0]} {key[1]} already downloaded")
+            video_store.touch(row["short_code"])
+            return _response(row)
+
+    flight = key or ("url", url)
+    task = _downloads.get(flight)
+    if task is None or task.done():
+        task = _downloads[flight] = asyncio.create_task(_download_and_store(url, downloader))
+        task.add_done_callback(lambda _: _downloads.pop(flight, None))
+    info = await asyncio.shield(task)
+    # Each caller gets its own copy, routes pop fields from it
+    return dict(info) if info else info
+
+
+async def videoDL(url,db):
+    return await _deduplicated_download(url, db, raw_video_downloader)
 async def videoDL_for_insta(url,db):
-    info = await asyncio.to_thread(raw_video_downloader_for_insta,url)
-    if not info or info.get("status") == 500:
-        return info
-    if not info or info.get("status") == 400:
-        return info
-    await db.execute(
-        "INSERT INTO videos (title, filepath, short_code) VALUES (?, ?, ?)",
-        (info["video_info"]["title"], info["path"], info["short"])
-    )
-    await db.commit()
-    return info
\ No newline at end of file
+    return await _deduplicated_download(url, db, raw_video_downloader_for_insta)
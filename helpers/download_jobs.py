@@ -0,0 +1,289 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import db as cache_db
+from helpers.download import raw_video_downloader, raw_video_downloader_for_insta
+from helpers.download import canonical_key, store_download, _find_downloaded, _response
+from helpers.video_store import video_store
+from helpers.executors import run_in
+
+# Job mode for /dl: submitting returns a job id at once, the yt-dlp download
+# runs in a bounded pool of worker processes, and progress from yt-dlp's
+# progress hooks flows back over a manager queue to pollers and SSE
+# subscribers. Downloads never occupy the event loop's thread pool.
+
+WORKERS = int(os.getenv("DL_JOB_WORKERS", "2"))
+# Submissions beyond this many queued jobs are refused
+MAX_QUEUED = int(os.getenv("DL_JOB_MAX_QUEUED", "50"))
+# Finished jobs kept for polling
+MAX_FINISHED = 500
+# Minimum seconds between progress messages from a worker
+PROGRESS_INTERVAL = 0.5
+# On shutdown, running downloads get this long to finish before they are
+# abandoned
+STOP_TIMEOUT = float(os.getenv("DL_JOB_STOP_SECONDS", "30"))
+
+ACTIVE_STATES = ("queued", "running")
+
+
+def _send(updates, message):
+    # The manager is gone once the app has stopped waiting for this job;
+    # the download itself carries on
+    try:
+        updates.put(message)
+    except (EOFError, OSError):
+        pass
+
+
+class _ProgressReporter:
+    """yt-dlp progress hook, runs inside the worker process"""
+
+    def __init__(self, job_id, updates):
+        self.job_id = job_id
+        self.updates = updates
+        self.last_sent = 0.0
+
+    def __call__(self, status):
+        now = time.time()
+        finished = status.get("status") != "downloading"
+        if not finished and now - self.last_sent < PROGRESS_INTERVAL:
+            return
+        self.last_sent = now
+        _send(self.updates, (self.job_id, "progress", {
+            "state": status.get("status"),
+            "downloaded_bytes": status.get("downloaded_bytes"),
+            "total_bytes": status.get("total_bytes") or status.get("total_bytes_estimate"),
+            "speed": status.get("speed"),
+            "eta": status.get("eta"),
+        }))
+
+
+def _next_update(updates):
+    """Next message from the workers, None after a second without one"""
+    try:
+        return updates.get(True, 1.0)
+    except queue.Empty:
+        return None
+
+
+def _run_job(job_id, url, platform, updates):
+    """Worker process entry point"""
+    _send(updates, (job_id, "started", {"started_at": time.time()}))
+    downloader = raw_video_downloader_for_insta if platform == "instagram" else raw_video_downloader
+    return downloader(url, progress_hook=_ProgressReporter(job_id, updates))
+
+
+class DownloadJobs:
+    def __init__(self):
+        self.jobs: OrderedDict = OrderedDict()
+        self._by_key: dict = {}
+        self._subscribers: dict[str, set] = {}
+        self._executor: ProcessPoolExecutor = None
+        self._manager = None
+        self._updates = None
+        self._pump_task: asyncio.Task = None
+        self._tasks: set[asyncio.Task] = set()
+        self._waits = []
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._updates = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=context)
+        self._pump_task = asyncio.create_task(self._pump())
+        print(f"✅ Download job workers ready ({WORKERS} processes)")
+
+    async def stop(self):
+        if self._executor:
+            # Jobs that have not started are dropped, running ones get
+            # STOP_TIMEOUT to finish and store their result
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            if self._tasks:
+                await asyncio.wait(self._tasks, timeout=STOP_TIMEOUT)
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._executor = None
+        if self._pump_task:
+            self._pump_task.cancel()
+            await asyncio.gather(self._pump_task, return_exceptions=True)
+            self._pump_task = None
+        if self._manager:
+            self._manager.shutdown()
+            self._manager = None
+        print("🔌 Download job workers stopped")
+
+    def queued(self):
+        return sum(1 for job in self.jobs.values() if job["state"] == "queued")
+
+    async def submit(self, url, platform):
+        """New job (or the running job for the same video); None when the queue is full"""
+        key = await canonical_key(url)
+        if key and key in self._by_key:
+            return self.jobs[self._by_key[key]]
+        if self.queued() >= MAX_QUEUED:
+            return None
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "url": url,
+            "platform": platform,
+            "state": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": None,
+            "result": None,
+        }
+        self.jobs[job["id"]] = job
+        self._prune()
+
+        if key:
+            async with cache_db.pool.connection() as db:
+                row = await _find_downloaded(key, db)
+            if row:
+                video_store.touch(row["short_code"])
+                job["started_at"] = job["finished_at"] = time.time()
+                self._finish(job, "done", _response(row))
+                return job
+            self._by_key[key] = job["id"]
+        task = asyncio.create_task(self._run(job, key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job, key):
+        loop = asyncio.get_running_loop()
+        try:
+            info = await loop.run_in_executor(
+                self._executor, _run_job, job["id"], job["url"], job["platform"], self._updates)
+            result = await store_download(info)
+        except Exception as e:
+            print(f"❌ Download job {job['id']} crashed: {e}")
+            result = {"status": 500, "message": "Internal Server error"}
+        finally:
+            if key:
+                self._by_key.pop(key, None)
+        job["finished_at"] = time.time()
+        if result and result.get("status") == 200:
+            result = {k: v for k, v in result.items() if k not in ("path", "short")}
+            self._finish(job, "done", result)
+        else:
+            self._finish(job, "failed", result)
+
+    def _finish(self, job, state, result):
+        job["state"] = state
+        job["result"] = result
+        if state == "done":
+            self.completed += 1
+        else:
+            self.failed += 1
+        self._notify(job)
+
+    async def _pump(self):
+        # Manager queue reads block, so they run on their own thread
+        while True:
+            try:
+                update = await run_in("job_events", _next_update, self._updates)
+            except (EOFError, OSError):
+                return
+            if update is None:
+                continue
+            job_id, kind, data = update
+            job = self.jobs.get(job_id)
+            if not job:
+                continue
+            # The result comes back through the pool, not this queue, so a
+            # short job can finish before its messages are read
+            if kind == "started":
+                if job["started_at"] is None:
+                    job["started_at"] = data["started_at"]
+                    self._waits.append(job["started_at"] - job["submitted_at"])
+                    self._waits = self._waits[-100:]
+                if job["state"] != "queued":
+                    continue
+                job["state"] = "running"
+            elif job["finished_at"] is None:
+                job["progress"] = data
+            else:
+                continue
+            self._notify(job)
+
+    def _notify(self, job):
+        for subscriber in self._subscribers.get(job["id"], ()):
+            subscriber.put_nowait(public_job(job))
+
+    async def events(self, job_id):
+        """Job snapshots as they change, ending once the job finishes"""
+        job = self.jobs[job_id]
+        updates: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(updates)
+        try:
+            snapshot = public_job(job)
+            while True:
+                yield snapshot
+                if snapshot["state"] not in ACTIVE_STATES:
+                    return
+                snapshot = await updates.get()
+        finally:
+            self._subscribers[job_id].discard(updates)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["state"] not in ACTIVE_STATES]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED)]:
+            del self.jobs[job_id]
+
+    def stats(self):
+        running = [job for job in self.jobs.values() if job["state"] == "running"]
+        finished = [
+            job for job in self.jobs.values()
+            if job["state"] == "done" and job["progress"] and job["started_at"] and job["finished_at"]
+        ]
+        throughputs = [
+            (job["progress"].get("downloaded_bytes") or 0) / max(job["finished_at"] - job["started_at"], 0.001)
+            for job in finished
+        ]
+        return {
+            "workers": WORKERS,
+            "queued": self.queued(),
+            "max_queued": MAX_QUEUED,
+            "running": len(running),
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_s": round(sum(self._waits) / len(self._waits), 3) if self._waits else 0.0,
+            "max_wait_s": round(max(self._waits), 3) if self._waits else 0.0,
+            "avg_bytes_per_s": round(sum(throughputs) / len(throughputs)) if throughputs else 0,
+            "running_jobs": {
+                job["id"]: (job["progress"] or {}).get("speed") for job in running
+            },
+        }
+
+
+def public_job(job):
+    """Job fields returned to clients"""
+    elapsed_end = job["finished_at"] or time.time()
+    progress = job["progress"] or {}
+    throughput = None
+    if job["started_at"] and progress.get("downloaded_bytes"):
+        throughput = round(progress["downloaded_bytes"] / max(elapsed_end - job["started_at"], 0.001))
+    return {
+        "job_id": job["id"],
+        "state": job["state"],
+        "platform": job["platform"],
+        "wait_s": round((job["started_at"] or elapsed_end) - job["submitted_at"], 3),
+        "progress": job["progress"],
+        "bytes_per_s": throughput,
+        "result": job["result"],
+    }
+
+
+download_jobs = DownloadJobs()
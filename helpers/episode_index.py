@@ -0,0 +1,235 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import db as cache_db
+from helpers.http_client import get_client
+from helpers.cookie_cache import get_animepahe_cookies
+
+# How long an airing show's index is trusted before its last page is re-fetched
+REFRESH_TTL = 30 * 60
+# A show whose newest release is older than this is treated as finished
+AIRING_WINDOW = timedelta(days=21)
+PAGE_STAGGER = 0.5
+# Release pages are fixed size; learned from responses, this is the fallback
+DEFAULT_PER_PAGE = 30
+# Pages fetched by targeted lookups are reused for this long
+PAGE_TTL = 10 * 60
+# At most this many pages are kept, least recently used go first
+MAX_PAGES = 512
+
+
+def _is_airing(episodes):
+    if not episodes:
+        return True
+    try:
+        latest = datetime.strptime(episodes[-1]["created_at"], "%Y-%m-%d %H:%M:%S")
+    except (KeyError, TypeError, ValueError):
+        return True
+    return datetime.now() - latest < AIRING_WINDOW
+
+
+class EpisodeIndex:
+    """
+    Per-anime map of episode position -> session/snapshot, keyed by external_id.
+    Held in memory and persisted in SQLite. Airing shows only re-fetch their
+    last page; concurrent requests for the same anime share one build.
+    """
+
+    def __init__(self):
+        self.entries: dict[str, dict] = {}
+        self.pages: OrderedDict = OrderedDict()
+        self._builds: dict = {}
+
+    async def get(self, external_id, episode=None):
+        """All episodes in release order; refreshed if `episode` is not indexed yet"""
+        entry = self.entries.get(external_id) or await self._load(external_id)
+        if entry is None:
+            entry = await self._single_flight(external_id, self._build, external_id)
+        elif self._needs_refresh(entry, episode):
+            entry = await self._single_flight(external_id, self._refresh, external_id) or entry
+        return entry["episodes"] if entry else None
+
+    async def lookup(self, external_id, start, end=None):
+        """
+        Episodes at positions start..end (1-based), fetching only the release
+        pages that hold them. Falls back to the full index when a page does
+        not line up with the expected positions.
+        """
+        end = end or start
+        entry = self.entries.get(external_id) or await self._load(external_id)
+        if entry and not self._needs_refresh(entry, end):
+            return entry["episodes"][start - 1:end]
+
+        per_page = entry["per_page"] if entry else DEFAULT_PER_PAGE
+        first_page = (start - 1) // per_page + 1
+        pages = list(range(first_page, (end - 1) // per_page + 2))
+        results = await asyncio.gather(*[
+            self._single_flight((external_id, page), self._cached_page, external_id, page, i * PAGE_STAGGER)
+            for i, page in enumerate(pages)
+        ])
+
+        selected = []
+        if all(data and data.get("per_page") == per_page for data in results):
+            episodes = [
+                {**item, "page": page}
+                for page, data in zip(pages, results) for item in data.get("data") or []
+            ]
+            offset = (first_page - 1) * per_page + 1
+            selected = episodes[start - offset:end - offset + 1]
+        if len(selected) != end - start + 1:
+            print(f"⚠️ Pages for {external_id} don't match positions, scanning full listing")
+            episodes = await self.get(external_id, end)
+            return episodes[start - 1:end] if episodes else []
+        return selected
+
+    async def _cached_page(self, external_id, page, delay=0):
+        key = (external_id, page)
+        cached = self.pages.get(key)
+        if cached and time.time() - cached[0] < PAGE_TTL:
+            self.pages.move_to_end(key)
+            return cached[1]
+        data = await self._fetch_page(external_id, page, delay)
+        self.pages[key] = (time.time(), data)
+        self.pages.move_to_end(key)
+        while len(self.pages) > MAX_PAGES:
+            self.pages.popitem(last=False)
+        return data
+
+    def _needs_refresh(self, entry, episode):
+        if episode and int(episode) > len(entry["episodes"]):
+            return True
+        return entry["airing"] and time.time() - entry["refreshed_at"] > REFRESH_TTL
+
+    async def _single_flight(self, key, build, *args):
+        task = self._builds.get(key)
+        if task is None or task.done():
+            task = self._builds[key] = asyncio.create_task(build(*args))
+            task.add_done_callback(lambda _: self._builds.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_page(self, external_id, page, delay=0):
+        # Stagger requests with delay
+        await asyncio.sleep(delay)
+        await get_animepahe_cookies()
+        url = (
+            f"https://animepahe.si/api"
+            f"?m=release&id={external_id}&sort=episode_asc&page={page}"
+        )
+        res = await get_client("animepahe").get(url, timeout=10.0)
+        return res.json()
+
+    async def _fetch_pages(self, external_id, pages):
+        results = await asyncio.gather(*[
+            self._fetch_page(external_id, page, i * PAGE_STAGGER)
+            for i, page in enumerate(pages)
+        ])
+        episodes = []
+        for page, data in zip(pages, results):
+            for item in data.get("data") or []:
+                episodes.append({**item, "page": page})
+        return episodes
+
+    async def _build(self, external_id):
+        first = await self._fetch_page(external_id, 1)
+        if not first or not first.get("last_page"):
+            return None
+        last_page = first["last_page"]
+        episodes = [{**item, "page": 1} for item in first.get("data") or []]
+        episodes += await self._fetch_pages(external_id, list(range(2, last_page + 1)))
+        entry = self._make_entry(first, episodes)
+        await self._save(external_id, entry, from_page=1)
+        self.entries[external_id] = entry
+        return entry
+
+    async def _refresh(self, external_id):
+        entry = self.entries[external_id]
+        old_last = entry["last_page"]
+        data = await self._fetch_page(external_id, old_last)
+        if not data or not data.get("last_page"):
+            return entry
+        episodes = [e for e in entry["episodes"] if e["page"] < old_last]
+        episodes += [{**item, "page": old_last} for item in data.get("data") or []]
+        if data["last_page"] > old_last:
+            episodes += await self._fetch_pages(
+                external_id, list(range(old_last + 1, data["last_page"] + 1))
+            )
+        entry = self._make_entry(data, episodes)
+        await self._save(external_id, entry, from_page=old_last)
+        self.entries[external_id] = entry
+        return entry
+
+    def _make_entry(self, data, episodes):
+        return {
+            "episodes": episodes,
+            "total": data.get("total") or len(episodes),
+            "per_page": data.get("per_page") or len(episodes),
+            "last_page": data["last_page"],
+            "airing": _is_airing(episodes),
+            "refreshed_at": time.time(),
+        }
+
+    async def _load(self, external_id):
+        if not cache_db.pool:
+            return None
+        async with cache_db.pool.connection() as db:
+            cursor = await db.execute(
+                "SELECT * FROM episode_index_meta WHERE external_id = ?", (external_id,))
+            meta = await cursor.fetchone()
+            if not meta:
+                return None
+            cursor = await db.execute(
+                "SELECT episode, session, snapshot, page, created_at FROM episode_index "
+                "WHERE external_id = ? ORDER BY position",
+                (external_id,)
+            )
+            rows = await cursor.fetchall()
+        entry = {
+            "episodes": [dict(row) for row in rows],
+            "total": meta["total"],
+            "per_page": meta["per_page"],
+            "last_page": meta["last_page"],
+            "airing": bool(meta["airing"]),
+            "refreshed_at": meta["refreshed_at"],
+        }
+        self.entries[external_id] = entry
+        return entry
+
+    async def _save(self, external_id, entry, from_page):
+        if not cache_db.pool:
+            return
+        rows = [
+            (external_id, position, e.get("episode"), e.get("session"),
+             e.get("snapshot"), e["page"], e.get("created_at"))
+            for position, e in enumerate(entry["episodes"], start=1)
+            if e["page"] >= from_page
+        ]
+        async with cache_db.pool.connection() as db:
+            await db.execute(
+                "DELETE FROM episode_index WHERE external_id = ? AND page >= ?",
+                (external_id, from_page)
+            )
+            await db.executemany(
+                "INSERT OR REPLACE INTO episode_index"
+                "(external_id, position, episode, session, snapshot, page, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            await db.execute(
+                """
+                INSERT INTO episode_index_meta(external_id, total, per_page, last_page, airing, refreshed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(external_id) DO UPDATE SET
+                    total = excluded.total,
+                    per_page = excluded.per_page,
+                    last_page = excluded.last_page,
+                    airing = excluded.airing,
+                    refreshed_at = excluded.refreshed_at
+                """,
+                (external_id, entry["total"], entry["per_page"], entry["last_page"],
+                 int(entry["airing"]), entry["refreshed_at"])
+            )
+            await db.commit()
+
+
+episode_index = EpisodeIndex()
@@ -0,0 +1,202 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# One executor per class of blocking work, so a burst of one kind cannot
+# starve another:
+#   ytdlp        yt-dlp extraction and downloads (seconds to minutes each)
+#   parse        HTML parsing and deobfuscation (CPU-bound, GIL-free in
+#                worker processes)
+#   blocking_io  short filesystem calls (stat, unlink, loading the GeoIP CSV)
+#   job_events   the /dl/jobs progress queue reader (one long poll)
+# Trivial calls (regex checks, hashing a title, URL quoting) run inline.
+# Submissions beyond an executor's workers wait on the event loop, where
+# their queue depth and wait time are measured.
+
+EXECUTORS = {
+    "ytdlp": {"processes": False, "workers": int(os.getenv("YTDLP_THREADS", "8"))},
+    # PARSE_PROCESSES=0 parses on threads instead
+    "parse": {"processes": True, "workers": int(os.getenv("PARSE_PROCESSES", "2"))},
+    "blocking_io": {"processes": False, "workers": int(os.getenv("IO_THREADS", "4"))},
+    "job_events": {"processes": False, "workers": 1},
+}
+
+# Imported by each parse worker at startup, so the first request does not
+# pay for it
+PARSE_PRELOAD = ("helpers.anime_helper",)
+
+
+def _preload(modules):
+    for module in modules:
+        __import__(module)
+
+
+class NamedExecutor:
+    def __init__(self, name, processes, workers):
+        self.name = name
+        self.processes = processes and workers > 0
+        self.workers = max(workers, 1)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.queued = 0
+        self.started = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.restarts = 0
+        self.preloaded = ()
+        self.pool = self._new_pool()
+
+    def _new_pool(self):
+        if self.processes:
+            return ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+
+    def preload(self, modules):
+        self.preloaded = modules
+        for _ in range(self.workers):
+            self.pool.submit(_preload, modules)
+
+    def _restart(self, broken):
+        # A worker process died (OOM, crash in a parser), which breaks the
+        # whole pool; replace it unless another caller already has
+        if self.pool is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.pool = self._new_pool()
+        self.restarts += 1
+        if self.preloaded:
+            self.preload(self.preloaded)
+        print(f"♻️ {self.name} worker pool restarted after a worker died")
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on this executor once a worker is free"""
+        try:
+            return await self._run(fn, *args)
+        except BrokenProcessPool:
+            # Once more on the fresh pool; if the call itself kills the
+            # worker, the pool is replaced again and the error is raised
+            return await self._run(fn, *args)
+
+    async def _run(self, fn, *args):
+        queued_at = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self.slots.release()
+            self._restart(pool)
+            raise
+        except BaseException:
+            self.slots.release()
+            raise
+        started = time.perf_counter()
+        waited = started - queued_at
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.started += 1
+        self.running += 1
+        # The slot is freed when the work really ends, even if the caller
+        # was cancelled while it ran
+        future.add_done_callback(lambda f: self._notify(loop, f, started))
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self._restart(pool)
+            raise
+
+    def _notify(self, loop, future, started):
+        try:
+            loop.call_soon_threadsafe(self._finished, future, started)
+        except RuntimeError:
+            pass  # loop already closed at shutdown
+
+    def _finished(self, future, started):
+        self.running -= 1
+        self.total_run += time.perf_counter() - started
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self.slots.release()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        done = self.completed + self.failed
+        return {
+            "kind": "process" if self.processes else "thread",
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait / self.started * 1000, 3) if self.started else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "avg_run_ms": round(self.total_run / done * 1000, 3) if done else 0.0,
+            "restarts": self.restarts,
+        }
+
+
+# Global executors, created in lifespan
+executors: dict[str, NamedExecutor] = {}
+
+
+def init_executors():
+    """
+    Create the named executors and warm the parse workers
+    Run this on startup!
+    """
+    for name, config in EXECUTORS.items():
+        if name not in executors:
+            executors[name] = NamedExecutor(name, config["processes"], config["workers"])
+    if executors["parse"].processes:
+        executors["parse"].preload(PARSE_PRELOAD)
+    print("✅ Executors ready: " + ", ".join(
+        f"{name} ({e.workers} {'processes' if e.processes else 'threads'})" for name, e in executors.items()))
+
+
+def close_executors():
+    """
+    Shut every executor down, dropping work that has not started
+    Run this on shutdown!
+    """
+    for executor in executors.values():
+        executor.shutdown()
+    executors.clear()
+    print("🔌 Executors stopped")
+
+
+def get_executor(name: str) -> NamedExecutor:
+    """Return a named executor (created lazily outside the app)"""
+    executor = executors.get(name)
+    if executor is None:
+        config = EXECUTORS[name]
+        executor = executors[name] = NamedExecutor(name, config["processes"], config["workers"])
+    return executor
+
+
+async def run_in(name: str, fn, *args):
+    """Run a blocking call on the named executor"""
+    return await get_executor(name).run(fn, *args)
+
+
+def get_executor_stats():
+    """Queue depth, wait and run time of every executor"""
+    return {name: executor.stats() for name, executor in executors.items()}
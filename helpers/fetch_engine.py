@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+from collections import deque
+from urllib.parse import urlsplit
+import httpx
+
+# Byte-range download engine for kwik direct links.
+# Segments are prefetched over several connections but handed out in order,
+# so a caller can stream them (e.g. into a ZIP). Memory is bounded by
+# WINDOW * SEGMENT_SIZE regardless of how many episodes are requested.
+
+SEGMENT_SIZE = int(os.getenv("DOWNLOAD_SEGMENT_MB", "4")) * 1024 * 1024
+WINDOW = int(os.getenv("DOWNLOAD_WINDOW", "8"))
+HOST_CONCURRENCY = int(os.getenv("DOWNLOAD_HOST_CONCURRENCY", "4"))
+SEGMENT_RETRIES = 3
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Per-host limits are shared by every download in the process
+_host_limits: dict[str, asyncio.Semaphore] = {}
+
+stats = {
+    "runs": 0,
+    "active_runs": 0,
+    "bytes": 0,
+    "seconds": 0.0,
+    "segments": 0,
+    "segment_retries": 0,
+    "failures": 0,
+}
+_busy_since = None
+
+
+def _host_limit(url):
+    host = urlsplit(url).hostname or ""
+    if host not in _host_limits:
+        _host_limits[host] = asyncio.Semaphore(HOST_CONCURRENCY)
+    return _host_limits[host]
+
+
+def _start_run():
+    # Throughput is measured over the time at least one download is active
+    global _busy_since
+    stats["runs"] += 1
+    stats["active_runs"] += 1
+    if _busy_since is None:
+        _busy_since = time.perf_counter()
+
+
+def _end_run():
+    global _busy_since
+    stats["active_runs"] -= 1
+    if stats["active_runs"] == 0 and _busy_since is not None:
+        stats["seconds"] += time.perf_counter() - _busy_since
+        _busy_since = None
+
+
+def get_download_stats():
+    seconds = stats["seconds"]
+    return {
+        **stats,
+        "seconds": round(seconds, 3),
+        "mb_per_s": round(stats["bytes"] / seconds / 1e6, 3) if seconds else 0.0,
+        "host_concurrency": HOST_CONCURRENCY,
+        "segment_size": SEGMENT_SIZE,
+        "window": WINDOW,
+    }
+
+
+class FetchEngine:
+    def __init__(self, client: httpx.AsyncClient, segment_size=SEGMENT_SIZE, window=WINDOW):
+        self.client = client
+        self.segment_size = segment_size
+        self.window = window
+
+    def _plan(self, files):
+        """Split (url, size, ranges) files into (index, url, start, end) segments"""
+        plan = []
+        for index, (url, size, ranges) in enumerate(files):
+            if not ranges:
+                # No range support: one streamed request, nothing buffered
+                plan.append((index, url, None, size))
+                continue
+            for start in range(0, size, self.segment_size):
+                plan.append((index, url, start, min(start + self.segment_size, size) - 1))
+        return plan
+
+    async def _fetch_segment(self, url, start, end):
+        expected = end - start + 1
+        for attempt in range(SEGMENT_RETRIES):
+            try:
+                async with _host_limit(url):
+                    res = await self.client.get(
+                        url,
+                        timeout=120,
+                        headers={"Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"},
+                    )
+                if res.status_code == 206 and len(res.content) == expected:
+                    stats["segments"] += 1
+                    stats["bytes"] += expected
+                    return res.content
+                print(f"⚠️ Segment {start}-{end} got {res.status_code} ({len(res.content)} bytes)")
+            except httpx.HTTPError as e:
+                print(f"⚠️ Segment {start}-{end} error: {e}")
+            stats["segment_retries"] += 1
+            await asyncio.sleep(0.5 * 2 ** attempt)
+        stats["failures"] += 1
+        raise RuntimeError(f"Segment {start}-{end} of {url} failed after {SEGMENT_RETRIES} attempts")
+
+    async def _stream_whole(self, url, size):
+        received = 0
+        async with _host_limit(url):
+            async with self.client.stream(
+                "GET", url, timeout=300, headers={"Accept-Encoding": "identity"}
+            ) as res:
+                if res.status_code != 200:
+                    stats["failures"] += 1
+                    raise RuntimeError(f"{url} returned {res.status_code}")
+                async for chunk in res.aiter_bytes(STREAM_CHUNK_SIZE):
+                    received += len(chunk)
+                    stats["bytes"] += len(chunk)
+                    yield chunk
+        if received != size:
+            stats["failures"] += 1
+            raise RuntimeError(f"{url} sent {received} bytes, expected {size}")
+
+    async def stream(self, files):
+        """
+        Yield (file_index, chunk) in file order for [(url, size, ranges), ...].
+        Up to `window` range segments are in flight ahead of the consumer.
+        """
+        plan = iter(self._plan(files))
+        pending = deque()
+
+        def fill():
+            while len(pending) < self.window:
+                segment = next(plan, None)
+                if segment is None:
+                    return
+                index, url, start, end = segment
+                task = None
+                if start is not None:
+                    task = asyncio.create_task(self._fetch_segment(url, start, end))
+                pending.append((segment, task))
+
+        _start_run()
+        try:
+            fill()
+            while pending:
+                (index, url, start, end), task = pending.popleft()
+                if task is None:
+                    # Unsegmented file, `end` holds its size
+                    async for chunk in self._stream_whole(url, end):
+                        yield index, chunk
+                else:
+                    data = await task
+                    fill()
+                    yield index, data
+                fill()
+        finally:
+            for _, task in pending:
+                if task:
+                    task.cancel()
+            _end_run()
@@ -0,0 +1,142 @@
+import csv
+import ipaddress
+import os
+import socket
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+# Offline IP -> country lookup. The range database is a CSV of
+#   start_ip,end_ip,country_code[,country_name]
+# (the layout of the free DB-IP / IP2Location "country lite" files). Ranges
+# are loaded into sorted parallel arrays, one set per IP version, and looked
+# up with a binary search; hot IPs are served from an LRU.
+
+GEOIP_DB = os.getenv("GEOIP_DB", "geoip.csv")
+LRU_SIZE = int(os.getenv("GEOIP_LRU_SIZE", "4096"))
+UNKNOWN = "Unknown"
+
+
+class _RangeTable:
+    def __init__(self, starts, ends, countries):
+        self.starts = starts
+        self.ends = ends
+        self.countries = countries
+
+    def find(self, number):
+        i = bisect_right(self.starts, number) - 1
+        if i >= 0 and number <= self.ends[i]:
+            return self.countries[i]
+        return None
+
+    def __len__(self):
+        return len(self.starts)
+
+
+def _load_tables(path):
+    """(ipv4 table, ipv6 table, country names) from a range CSV"""
+    names: dict[str, int] = {}
+    rows = {4: [], 6: []}
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            try:
+                start = ipaddress.ip_address(row[0].strip())
+                end = ipaddress.ip_address(row[1].strip())
+            except ValueError:
+                continue  # header or malformed line
+            name = (row[3] if len(row) > 3 and row[3].strip() else row[2]).strip()
+            index = names.setdefault(name, len(names))
+            rows[start.version].append((int(start), int(end), index))
+
+    tables = {}
+    for version, ranges in rows.items():
+        ranges.sort()
+        starts = [r[0] for r in ranges]
+        ends = [r[1] for r in ranges]
+        countries = array("H", [r[2] for r in ranges])
+        if version == 4:
+            # 32-bit ranges fit in a compact unsigned array
+            starts, ends = array("I", starts), array("I", ends)
+        tables[version] = _RangeTable(starts, ends, countries)
+    return tables[4], tables[6], list(names)
+
+
+class GeoIP:
+    def __init__(self, path=GEOIP_DB):
+        self.path = path
+        self.v4 = _RangeTable(array("I"), array("I"), array("H"))
+        self.v6 = _RangeTable([], [], array("H"))
+        self.names: list[str] = []
+        self.cache: OrderedDict = OrderedDict()
+        self.loaded_at = None
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path=None):
+        """(Re)load the range database; the old tables keep serving until the swap"""
+        path = path or self.path
+        if not os.path.exists(path):
+            print(f"⚠️ GeoIP database {path} not found, countries will be '{UNKNOWN}'")
+            return False
+        started = time.perf_counter()
+        v4, v6, names = _load_tables(path)
+        self.v4, self.v6, self.names, self.path = v4, v6, names, path
+        self.cache = OrderedDict()
+        self.loaded_at = time.time()
+        print(f"✅ GeoIP loaded ({len(v4)} IPv4 + {len(v6)} IPv6 ranges "
+              f"in {time.perf_counter() - started:.2f}s)")
+        return True
+
+    def lookup(self, ip):
+        """Country for an IP address, or 'Unknown'"""
+        country = self.cache.get(ip)
+        if country is not None:
+            self.hits += 1
+            self.cache.move_to_end(ip)
+            return country
+        self.misses += 1
+        country = self._find(ip)
+        self.cache[ip] = country
+        if len(self.cache) > LRU_SIZE:
+            self.cache.popitem(last=False)
+        return country
+
+    def _find(self, ip):
+        try:
+            # Fast path for dotted IPv4; private ranges are absent from the tables
+            return self._country(self.v4.find(int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")))
+        except (OSError, TypeError):
+            pass
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return UNKNOWN
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            return UNKNOWN
+        table = self.v4 if address.version == 4 else self.v6
+        return self._country(table.find(int(address)))
+
+    def _country(self, index):
+        return self.names[index] if index is not None else UNKNOWN
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "source": self.path,
+            "loaded_at": self.loaded_at,
+            "ipv4_ranges": len(self.v4),
+            "ipv6_ranges": len(self.v6),
+            "countries": len(self.names),
+            "cached_ips": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+geoip = GeoIP()
@@ -0,0 +1,162 @@
+import httpx
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+BROWSER_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/131 Safari/537.36"
+
+# One managed client per upstream. Limits are per client, so each upstream
+# host gets its own connection budget and keep-alive pool.
+UPSTREAMS = {
+    "animepahe": {
+        "http2": True,
+        "max_connections": 10,
+        "max_keepalive": 10,
+        "headers": {"User-Agent": BROWSER_UA},
+    },
+    "pahe": {
+        "http2": True,
+        "max_connections": 10,
+        "max_keepalive": 5,
+        "headers": {},
+    },
+    "kwik": {
+        "http2": True,
+        "max_connections": 10,
+        "max_keepalive": 5,
+        "headers": {},
+    },
+    "kwik_redirect": {
+        "http2": True,
+        "max_connections": 10,
+        "max_keepalive": 5,
+        "headers": {},
+    },
+    "cdn": {
+        "http2": False,
+        "max_connections": 20,
+        "max_keepalive": 10,
+        "follow_redirects": True,
+        "headers": {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Referer": "https://kwik.cx/",
+        },
+    },
+    # /dl stream mode: media files piped from TikTok/YouTube/Facebook CDNs.
+    # yt-dlp supplies the per-format headers.
+    "media": {
+        "http2": False,
+        "max_connections": 20,
+        "max_keepalive": 10,
+        "follow_redirects": True,
+        "headers": {},
+    },
+    "shortlink": {
+        "http2": False,
+        "max_connections": 10,
+        "max_keepalive": 5,
+        "follow_redirects": True,
+        "headers": {"User-Agent": BROWSER_UA},
+    },
+}
+
+KEEPALIVE_EXPIRY = 30
+DEFAULT_TIMEOUT = 30
+
+# Shared cookie jar. Only the animepahe domains may store cookies in it, so
+# per-request sessions from kwik (kwik_session) are never replayed.
+cookie_jar = CookieJar(
+    policy=DefaultCookiePolicy(allowed_domains=[".animepahe.si", "animepahe.si", "pahe.win"])
+)
+
+# Global clients, created in lifespan
+clients: dict[str, httpx.AsyncClient] = {}
+request_counts: dict[str, dict] = {}
+
+
+def _build_client(name):
+    config = UPSTREAMS[name]
+    counts = request_counts.setdefault(name, {"requests": 0, "errors": 0})
+
+    async def on_response(response):
+        counts["requests"] += 1
+        if response.status_code >= 400:
+            counts["errors"] += 1
+
+    return httpx.AsyncClient(
+        http2=config["http2"],
+        limits=httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive"],
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=DEFAULT_TIMEOUT,
+        headers=config["headers"],
+        follow_redirects=config.get("follow_redirects", False),
+        cookies=cookie_jar,
+        event_hooks={"response": [on_response]},
+    )
+
+
+async def init_http_clients():
+    """
+    Create one pooled client per upstream host
+    Run this on startup!
+    """
+    for name in UPSTREAMS:
+        if name not in clients:
+            clients[name] = _build_client(name)
+    print(f"✅ HTTP clients ready: {', '.join(clients)}")
+
+
+async def close_http_clients():
+    """
+    Close every upstream client
+    Run this on shutdown!
+    """
+    for client in clients.values():
+        await client.aclose()
+    clients.clear()
+    print("🔌 HTTP clients closed")
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Return the shared client for an upstream (created lazily outside the app)"""
+    client = clients.get(name)
+    if client is None or client.is_closed:
+        client = clients[name] = _build_client(name)
+    return client
+
+
+def set_cookies(cookies: dict, domain: str):
+    """Load cookies into the shared jar for the given domain"""
+    jar = httpx.Cookies(cookie_jar)
+    for name, value in cookies.items():
+        jar.set(name, value, domain=domain)
+
+
+def _probe(read):
+    # Pool stats read httpx/httpcore internals, checked against the versions
+    # pinned in requirements.txt; a field that no longer reads is None
+    try:
+        return read()
+    except Exception:
+        return None
+
+
+def get_pool_stats():
+    """Connection pool statistics for every upstream client"""
+    stats = {}
+    for name, client in clients.items():
+        pool = _probe(lambda: client._transport._pool)
+        connections = _probe(lambda: list(pool.connections))
+        pool_requests = _probe(lambda: list(pool._requests))
+        queued = _probe(lambda: sum(1 for request in pool_requests if request.is_queued()))
+        stats[name] = {
+            "connections": _probe(lambda: len(connections)),
+            "idle": _probe(lambda: sum(1 for conn in connections if conn.is_idle())),
+            "http2": _probe(lambda: sum(1 for conn in connections if "HTTP/2" in conn.info())),
+            "active_requests": _probe(lambda: len(pool_requests) - queued),
+            "queued_requests": queued,
+            "max_connections": UPSTREAMS[name]["max_connections"],
+            **request_counts.get(name, {}),
+        }
+    return stats
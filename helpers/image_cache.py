@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from helpers.executors import run_in
+
+# On-disk cache for proxied animepahe images. Files are named by the sha256
+# of their URL, with a small JSON sidecar for the content type and an ETag
+# hashed from the stored bytes. An in-memory LRU index tracks sizes so
+# the directory stays under IMAGE_CACHE_MB.
+
+CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "image_cache")
+MAX_BYTES = int(os.getenv("IMAGE_CACHE_MB", "512")) * 1024 * 1024
+# Temp files this old are removed even if their writer's pid is alive (the
+# pid may have been reused)
+STALE_TMP_SECONDS = 3600
+
+
+def image_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _stale_tmp(name, path):
+    """A temp file left by a writer that is gone; other workers share the directory"""
+    try:
+        pid = int(name.split(".")[1])
+    except (IndexError, ValueError):
+        return True
+    if pid == os.getpid():
+        return True  # left by an earlier process with our pid
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # alive, owned by another user
+    try:
+        return time.time() - os.stat(path).st_mtime > STALE_TMP_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def _read_entry(path):
+    with open(path + ".json") as f:
+        meta = json.load(f)
+    return meta, os.stat(path)
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class ImageCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index: OrderedDict = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self):
+        """Rebuild the LRU index from disk, oldest access first"""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                if _stale_tmp(name, path):
+                    _remove_files([path])
+                continue
+            if name.endswith(".json") or not os.path.exists(path + ".json"):
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_atime, name, stat.st_size))
+        self.index.clear()
+        self.total_bytes = 0
+        for _, name, size in sorted(found):
+            self.index[name] = size
+            self.total_bytes += size
+        _remove_files(self._evict())
+        print(f"✅ Image cache ready ({len(self.index)} files, {self.total_bytes // 1024} KB)")
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    async def lookup(self, url):
+        """(path, content_type, last_modified, etag) for a cached image, else None"""
+        key = image_key(url)
+        if key not in self.index:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            meta, stat = await run_in("blocking_io", _read_entry, path)
+        except OSError:
+            await run_in("blocking_io", _remove_files, self._drop(key))
+            self.misses += 1
+            return None
+        self.index.move_to_end(key)
+        self.hits += 1
+        # Files stored before content ETags fall back to size and mtime
+        etag = meta.get("etag") or f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        return path, meta["content_type"], formatdate(stat.st_mtime, usegmt=True), etag
+
+    def writer(self, url, content_type):
+        return _ImageWriter(self, image_key(url), content_type)
+
+    def _store(self, key, size):
+        """Index a published file; returns the paths evicted to make room"""
+        if key in self.index:
+            self.total_bytes -= self.index[key]
+        self.index[key] = size
+        self.total_bytes += size
+        return self._evict()
+
+    def _drop(self, key):
+        """Unindex a file; returns its paths for the caller to remove"""
+        size = self.index.pop(key, 0)
+        self.total_bytes -= size
+        return [self._path(key), self._path(key) + ".json"]
+
+    def _evict(self):
+        paths = []
+        while self.total_bytes > self.max_bytes and self.index:
+            key = next(iter(self.index))
+            paths += self._drop(key)
+            self.evictions += 1
+        return paths
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "files": len(self.index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class _ImageWriter:
+    """
+    Writes a streamed image to a temp file and publishes it on commit.
+    The file work runs on the blocking_io executor, off the event loop.
+    """
+
+    def __init__(self, cache: ImageCache, key, content_type):
+        self.cache = cache
+        self.key = key
+        self.content_type = content_type
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.tmp_path = cache._path(f"{key}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+        self.file = None
+
+    def _write(self, chunk):
+        if self.file is None:
+            os.makedirs(self.cache.directory, exist_ok=True)
+            self.file = open(self.tmp_path, "wb")
+        self.file.write(chunk)
+        self.digest.update(chunk)
+
+    def _publish(self):
+        if self.file is None:
+            self._write(b"")
+        self.file.close()
+        path = self.cache._path(self.key)
+        with open(path + ".json", "w") as f:
+            json.dump({"content_type": self.content_type, "etag": f'"{self.digest.hexdigest()[:32]}"'}, f)
+        os.replace(self.tmp_path, path)
+
+    def _discard(self):
+        if self.file is not None:
+            self.file.close()
+        _remove_files([self.tmp_path])
+
+    async def write(self, chunk):
+        await run_in("blocking_io", self._write, chunk)
+        self.size += len(chunk)
+
+    async def commit(self):
+        await run_in("blocking_io", self._publish)
+        evicted = self.cache._store(self.key, self.size)
+        if evicted:
+            await run_in("blocking_io", _remove_files, evicted)
+
+    async def abort(self):
+        await run_in("blocking_io", self._discard)
+
+
+image_cache = ImageCache()
@@ -0,0 +1,219 @@
+import asyncio
+import statistics
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+import db as cache_db
+from helpers.http_client import get_client
+
+# Direct CDN links are cached in an in-memory LRU in front of the
+# cached_video_url table. Each link carries an expiry, either from its signed
+# URL parameters or from lifetimes observed when links died. Within that
+# expiry a link is served without a HEAD; near expiry it is checked in a
+# batched background HEAD and re-resolved if dead.
+
+MAX_ENTRIES = 4096
+# Used until a lifetime has been observed
+DEFAULT_TTL = 30 * 60
+# Links this close to expiry are revalidated in the background
+REVALIDATE_AHEAD = 5 * 60
+# A link that passes a HEAD without a signed expiry is trusted this much longer
+REVALIDATE_EXTEND = 10 * 60
+# Learned lifetimes are scaled down so links are retired before they die
+LIFETIME_SAFETY = 0.8
+BATCH_DELAY = 1.0
+BATCH_CONCURRENCY = 8
+
+EXPIRY_PARAMS = ("expires", "expire", "exp", "e", "expiry", "validto")
+
+
+def parse_signed_expiry(url):
+    """Epoch expiry from a signed URL's query string, or None"""
+    query = {k.lower(): v[0] for k, v in parse_qs(urlsplit(url).query).items()}
+    for name in EXPIRY_PARAMS:
+        value = query.get(name)
+        if value and value.isdigit() and int(value) > 1_000_000_000:
+            return float(value)
+    # AWS style: X-Amz-Date=20240101T000000Z&X-Amz-Expires=3600
+    if "x-amz-date" in query and query.get("x-amz-expires", "").isdigit():
+        try:
+            signed = datetime.strptime(query["x-amz-date"], "%Y%m%dT%H%M%SZ")
+        except ValueError:
+            return None
+        return signed.replace(tzinfo=timezone.utc).timestamp() + int(query["x-amz-expires"])
+    return None
+
+
+class LinkCache:
+    def __init__(self):
+        self.entries: OrderedDict = OrderedDict()
+        self.dead_ages = deque(maxlen=50)
+        self._pending: dict = {}
+        self._batch_task: asyncio.Task = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.reresolved = 0
+
+    def learned_ttl(self):
+        if not self.dead_ages:
+            return DEFAULT_TTL
+        # Never so short that new links are due for revalidation on arrival
+        return max(statistics.median(self.dead_ages) * LIFETIME_SAFETY, REVALIDATE_AHEAD)
+
+    def _expiry_for(self, url, fetched_at):
+        signed = parse_signed_expiry(url)
+        return signed if signed else fetched_at + self.learned_ttl()
+
+    def put(self, id, episode, direct_link, size, snapshot, fetched_at=None, expires_at=None):
+        fetched_at = fetched_at or time.time()
+        entry = {
+            "direct_link": direct_link,
+            "size": size,
+            "snapshot": snapshot,
+            "episode": episode,
+            "fetched_at": fetched_at,
+            "expires_at": expires_at or self._expiry_for(direct_link, fetched_at),
+            "signed": parse_signed_expiry(direct_link) is not None,
+        }
+        key = (id, str(episode))
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > MAX_ENTRIES:
+            self.entries.popitem(last=False)
+        return entry
+
+    def evict(self, id, episode):
+        self.entries.pop((id, str(episode)), None)
+
+    async def get(self, id, episode, db):
+        """Cached link for an episode, or None when the caller must resolve it"""
+        key = (id, str(episode))
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = await self._load(id, episode, db)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        if now >= entry["expires_at"]:
+            self.evict(id, episode)
+            self.misses += 1
+            return None
+        if entry["expires_at"] - now < REVALIDATE_AHEAD:
+            self._schedule(key)
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    async def _load(self, id, episode, db):
+        cursor = await db.execute(
+            "SELECT * FROM cached_video_url WHERE internal_id = ? and episode = ?", (id, episode))
+        row = await cursor.fetchone()
+        if not row or not row["video_url"]:
+            return None
+        if row["fetched_at"] is None:
+            # Row written before expiry tracking, verify it once
+            try:
+                res = await get_client("cdn").head(row["video_url"], timeout=10, follow_redirects=False)
+            except Exception as e:
+                print(f"⚠️ Cached link check failed ({e}), fetching fresh...")
+                return None
+            if res.status_code != 200:
+                return None
+            entry = self.put(id, row["episode"], row["video_url"], row["size"], row["snapshot"])
+            await self._persist_expiry(id, row["episode"], entry)
+            return entry
+        return self.put(
+            id, row["episode"], row["video_url"], row["size"], row["snapshot"],
+            fetched_at=row["fetched_at"], expires_at=row["expires_at"]
+        )
+
+    async def _persist_expiry(self, id, episode, entry):
+        # Keeps the row in step with the entry, so a restart (or a reload
+        # after eviction) neither repeats a HEAD nor serves a dead link
+        try:
+            async with cache_db.pool.connection() as db:
+                await db.execute(
+                    "UPDATE cached_video_url SET fetched_at = ?, expires_at = ? "
+                    "WHERE internal_id = ? and episode = ?",
+                    (entry["fetched_at"], entry["expires_at"], id, episode)
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"⚠️ Could not store link expiry for {id} episode {episode}: {e}")
+
+    def _schedule(self, key):
+        self._pending[key] = True
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_task = asyncio.create_task(self._run_batch())
+
+    async def _run_batch(self):
+        limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def check(key):
+            async with limit:
+                await self._revalidate(key)
+
+        # Keys scheduled while a batch is running are picked up by the next round
+        while self._pending:
+            await asyncio.sleep(BATCH_DELAY)
+            keys = list(self._pending)
+            self._pending.clear()
+            await asyncio.gather(*[check(key) for key in keys], return_exceptions=True)
+
+    async def _revalidate(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        if not entry["signed"]:
+            # A signed expiry can't be extended, only unsigned links are HEADed
+            try:
+                res = await get_client("cdn").head(entry["direct_link"], timeout=10, follow_redirects=False)
+            except Exception as e:
+                # Unknown, not dead: keep serving, the next hit schedules a retry
+                print(f"⚠️ Link revalidation failed for {key}: {e}")
+                return
+            if res.status_code == 200:
+                self.revalidated += 1
+                entry["expires_at"] = time.time() + REVALIDATE_EXTEND
+                await self._persist_expiry(*key, entry)
+                return
+            # Dead link: remember how long it lived, stop serving it here and
+            # from the table
+            now = time.time()
+            self.dead_ages.append(now - entry["fetched_at"])
+            entry["expires_at"] = now
+            self.evict(*key)
+            await self._persist_expiry(*key, entry)
+        # Signed links keep serving until the replacement is stored
+        await self._reresolve(*key)
+
+    async def _reresolve(self, id, episode):
+        # Lazy import: the pipeline stores its results in this cache
+        from helpers.pipeline import resolve_pipeline
+        async with cache_db.pool.connection() as db:
+            cursor = await db.execute(
+                "SELECT external_id FROM anime_info WHERE internal_id = ?", (id,))
+            row = await cursor.fetchone()
+        if row:
+            self.reresolved += 1
+            await resolve_pipeline.resolve(id, int(episode), row["external_id"])
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "revalidated": self.revalidated,
+            "reresolved": self.reresolved,
+            "pending_revalidation": len(self._pending),
+            "learned_ttl": round(self.learned_ttl()),
+        }
+
+
+link_cache = LinkCache()
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import time
+from collections import deque
+import db as cache_db
+from helpers.anime_helper import get_episode_range,get_pahewin_link,get_kiwi_url,get_kiwi_info
+from helpers.anime_helper import get_direct_link,save_direct_link
+
+# Episode resolution runs as a chain of stages. Each stage has its own
+# bounded queue and worker pool, shared by every request in the process,
+# so each upstream (animepahe, pahe.win, kwik, redirect service) sees at
+# most `workers` concurrent calls no matter how many bulk requests arrive.
+
+QUEUE_SIZE = 200
+RATE_WINDOW = 60  # seconds of completions used for the throughput figure
+
+
+def _workers(stage, default):
+    return int(os.getenv(f"PIPELINE_{stage.upper()}_WORKERS", str(default)))
+
+
+class Stage:
+    def __init__(self, name, handler, workers):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue: asyncio.Queue = None
+        self.next: "Stage" = None
+        self._tasks = []
+        self._completed = deque()
+        self.processed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.busy_time = 0.0
+        self.max_depth = 0
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def put(self, job):
+        await self.queue.put(job)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job["future"].done():
+                    # Caller went away, don't spend upstream calls on it
+                    continue
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job):
+        started = time.perf_counter()
+        self.in_flight += 1
+        try:
+            ok = await self.handler(job)
+        except Exception as e:
+            print(f"❌ Episode {job['episode']}: {self.name} stage error - {e}")
+            ok = False
+        finally:
+            self.in_flight -= 1
+            self.busy_time += time.perf_counter() - started
+
+        now = time.time()
+        self._completed.append(now)
+        while self._completed and now - self._completed[0] > RATE_WINDOW:
+            self._completed.popleft()
+
+        if not ok:
+            self.failed += 1
+            if not job["future"].done():
+                job["future"].set_result(None)
+            return
+        self.processed += 1
+        if self.next:
+            await self.next.put(job)
+        elif not job["future"].done():
+            job["future"].set_result(job["result"])
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "max_queue_depth": self.max_depth,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_ms": round(self.busy_time / (self.processed + self.failed) * 1000, 1)
+            if self.processed + self.failed else 0.0,
+            "per_minute": len(self._completed) * 60 / RATE_WINDOW,
+        }
+
+
+async def _episode_stage(job):
+    episodes = await get_episode_range(job["external_id"], job["episode"])
+    if not episodes:
+        print(f"❌ Episode {job['episode']}: Not in release listing")
+        return False
+    job["session"] = episodes[0].get("session")
+    job["snapshot"] = episodes[0].get("snapshot")
+    return True
+
+
+async def _pahe_stage(job):
+    job["pahe_link"] = await get_pahewin_link(job["external_id"], job["session"])
+    if not job["pahe_link"]:
+        print(f"❌ Episode {job['episode']}: No pahe link found")
+    return bool(job["pahe_link"])
+
+
+async def _kiwi_url_stage(job):
+    job["kiwi_url"] = await get_kiwi_url(job["pahe_link"])
+    if not job["kiwi_url"]:
+        print(f"❌ Episode {job['episode']}: No kiwi URL found")
+    return bool(job["kiwi_url"])
+
+
+async def _kiwi_info_stage(job):
+    job["kiwi_info"] = await get_kiwi_info(job["kiwi_url"])
+    return bool(job["kiwi_info"])
+
+
+async def _direct_link_stage(job):
+    direct_link = await get_direct_link(job["kiwi_url"], job["kiwi_info"])
+    if not direct_link:
+        print(f"❌ Episode {job['episode']}: Failed to get redirect link")
+        return False
+    size = job["kiwi_info"].get("size")
+    try:
+        # Own short unit of work: commits at once, holds no reader while the
+        # caller's request connection is still open
+        async with cache_db.pool.connection() as db:
+            await save_direct_link(job["id"], job["episode"], direct_link, size, job["snapshot"], db)
+    except Exception as e:
+        # The link is still good; it just won't be cached
+        print(f"⚠️ Episode {job['episode']}: Could not cache direct link - {e}")
+    job["result"] = {
+        "direct_link": direct_link,
+        "episode": job["episode"],
+        "snapshot": job["snapshot"],
+        "status": 200,
+        "size": size
+    }
+    return True
+
+
+class ResolvePipeline:
+    """episode index -> pahe link -> kiwi url -> kiwi info -> direct link"""
+
+    def __init__(self):
+        self.stages = [
+            Stage("episode_index", _episode_stage, _workers("episode_index", 4)),
+            Stage("pahe_link", _pahe_stage, _workers("pahe_link", 3)),
+            Stage("kiwi_url", _kiwi_url_stage, _workers("kiwi_url", 3)),
+            Stage("kiwi_info", _kiwi_info_stage, _workers("kiwi_info", 3)),
+            Stage("direct_link", _direct_link_stage, _workers("direct_link", 2)),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next = next_stage
+
+    async def start(self):
+        for stage in self.stages:
+            stage.start()
+        print("✅ Resolve pipeline started")
+
+    async def stop(self):
+        for stage in self.stages:
+            await stage.stop()
+        print("🔌 Resolve pipeline stopped")
+
+    async def resolve(self, id, episode, external_id):
+        """Run one episode through every stage; None if any stage fails"""
+        future = asyncio.get_running_loop().create_future()
+        job = {"id": id, "episode": episode, "external_id": external_id, "future": future}
+        await self.stages[0].put(job)
+        try:
+            return await future
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
+
+
+resolve_pipeline = ResolvePipeline()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict
+import db as cache_db
+
+# Search results keyed by normalized query: in-memory LRU backed by the
+# search_cache table. Fresh entries are served as-is; stale ones are served
+# immediately while a single background refresh replaces them.
+
+FRESH_TTL = 10 * 60
+STALE_TTL = 24 * 60 * 60
+MAX_ENTRIES = 1024
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def _log_failure(task):
+    # A waiting caller still gets the exception; this covers background refreshes
+    if not task.cancelled() and task.exception():
+        print(f"❌ Search refresh failed: {task.exception()}")
+
+
+class SearchCache:
+    def __init__(self):
+        self.entries: OrderedDict = OrderedDict()
+        self._refreshes: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, query, fetch):
+        """
+        Results for `query`. `fetch(query)` is awaited on a miss and run in
+        the background for stale entries.
+        """
+        key = normalize_query(query)
+        entry = self.entries.get(key) or await self._load(key)
+        if entry:
+            age = time.time() - entry["fetched_at"]
+            if age < FRESH_TTL:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry["results"]
+            if age < STALE_TTL:
+                self.stale_hits += 1
+                self.entries.move_to_end(key)
+                self._refresh(key, fetch)
+                return entry["results"]
+        self.misses += 1
+        return await asyncio.shield(self._refresh(key, fetch))
+
+    def _refresh(self, key, fetch):
+        task = self._refreshes.get(key)
+        if task is None or task.done():
+            task = self._refreshes[key] = asyncio.create_task(self._fetch_and_store(key, fetch))
+            task.add_done_callback(lambda t: self._refreshes.pop(key, None))
+            task.add_done_callback(_log_failure)
+        return task
+
+    async def _fetch_and_store(self, key, fetch):
+        results = await fetch(key)
+        self._put(key, results, time.time())
+        await self._save(key)
+        return results
+
+    def _put(self, key, results, fetched_at):
+        self.entries[key] = {"results": results, "fetched_at": fetched_at}
+        self.entries.move_to_end(key)
+        while len(self.entries) > MAX_ENTRIES:
+            self.entries.popitem(last=False)
+        return self.entries[key]
+
+    async def _load(self, key):
+        if not cache_db.pool:
+            return None
+        async with cache_db.pool.connection() as db:
+            cursor = await db.execute(
+                "SELECT results, fetched_at FROM search_cache WHERE query = ?", (key,))
+            row = await cursor.fetchone()
+        if not row:
+            return None
+        return self._put(key, json.loads(row["results"]), row["fetched_at"])
+
+    async def _save(self, key):
+        if not cache_db.pool:
+            return
+        entry = self.entries[key]
+        async with cache_db.pool.connection() as db:
+            await db.execute(
+                "INSERT OR REPLACE INTO search_cache(query, results, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry["results"]), entry["fetched_at"])
+            )
+            await db.commit()
+
+    async def invalidate(self, query=None):
+        """Drop one query, or everything when query is None"""
+        if query is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(normalize_query(query), None)
+        if not cache_db.pool:
+            return
+        async with cache_db.pool.connection() as db:
+            if query is None:
+                await db.execute("DELETE FROM search_cache")
+            else:
+                await db.execute("DELETE FROM search_cache WHERE query = ?", (normalize_query(query),))
+            await db.commit()
+
+    def stats(self):
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / total, 3) if total else 0.0,
+            "refreshing": len(self._refreshes),
+        }
+
+
+search_cache = SearchCache()
@@ -0,0 +1,235 @@
+import asyncio
+import os
+import shutil
+import time
+import db as cache_db
+from helpers.executors import run_in
+
+# Lifecycle of the files /dl writes into downloads/. Every row of videos
+# carries the file size, when it was stored and when it was last served.
+# A background evictor keeps the tracked bytes under DOWNLOADS_QUOTA_MB by
+# deleting the least recently served files (and their rows), skipping pinned
+# videos and files younger than DOWNLOADS_MIN_AGE_SECONDS.
+#
+# It also keeps the short_code -> file path index /file/{code} serves from.
+# Every insert and delete of a videos row goes through here, so the index
+# stays in sync without a SQLite lookup per hit.
+
+DOWNLOAD_DIR = "downloads"
+QUOTA_BYTES = int(os.getenv("DOWNLOADS_QUOTA_MB", "10240")) * 1024 * 1024
+# Eviction frees space down to this fraction of the quota, so it does not
+# run again on the very next download
+LOW_WATERMARK = 0.9
+MIN_AGE = float(os.getenv("DOWNLOADS_MIN_AGE_SECONDS", "3600"))
+SWEEP_INTERVAL = float(os.getenv("DOWNLOADS_SWEEP_SECONDS", "300"))
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _file_sizes(rows):
+    return [(row_id, file_size(path)) for row_id, path in rows]
+
+
+class VideoStore:
+    def __init__(self, quota=QUOTA_BYTES, min_age=MIN_AGE):
+        self.quota = quota
+        self.min_age = min_age
+        self.tracked_bytes = 0
+        self.tracked_files = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.last_sweep = None
+        self.paths: dict[str, str] = {}
+        self.index_misses = 0
+        # short_code -> last serve time, written back on each sweep so
+        # serving a file never waits for the SQLite writer
+        self._accessed: dict[str, float] = {}
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task = None
+
+    async def load(self):
+        """Build the short code index from the videos table"""
+        async with cache_db.pool.connection() as db:
+            cursor = await db.execute("SELECT short_code, filepath FROM videos")
+            self.paths = {row["short_code"]: row["filepath"] for row in await cursor.fetchall()}
+        print(f"✅ Video index ready ({len(self.paths)} short codes)")
+
+    async def lookup(self, short_code):
+        """File path for a short code, or None"""
+        path = self.paths.get(short_code)
+        if path is not None:
+            return path
+        # Rows written outside this process (another worker, manual edits)
+        self.index_misses += 1
+        async with cache_db.pool.connection() as db:
+            cursor = await db.execute("SELECT filepath FROM videos WHERE short_code = ?", (short_code,))
+            row = await cursor.fetchone()
+        if row:
+            self.paths[short_code] = row["filepath"]
+            return row["filepath"]
+        return None
+
+    def forget(self, short_code):
+        """Drop a short code whose row or file is gone"""
+        self.paths.pop(short_code, None)
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        print(f"✅ Download evictor started (quota {self.quota // (1024 * 1024)} MB)")
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self._flush_access()
+        print("🔌 Download evictor stopped")
+
+    def touch(self, short_code):
+        """Record that a stored video was just served"""
+        self._accessed[short_code] = time.time()
+
+    def added(self, short_code, path, size):
+        """A download was stored; sweep now if it pushed usage over the quota"""
+        self.paths[short_code] = path
+        self.tracked_bytes += size or 0
+        self.tracked_files += 1
+        if self.tracked_bytes > self.quota:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"⚠️ Download eviction failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), SWEEP_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _flush_access(self):
+        if not self._accessed or cache_db.pool is None:
+            return
+        accessed, self._accessed = self._accessed, {}
+        async with cache_db.pool.connection() as db:
+            await db.executemany(
+                "UPDATE videos SET last_access = MAX(COALESCE(last_access, 0), ?) WHERE short_code = ?",
+                [(at, code) for code, at in accessed.items()]
+            )
+            await db.commit()
+
+    async def _backfill_sizes(self, db):
+        # Rows from before size tracking; a row whose file is gone is dropped
+        cursor = await db.execute("SELECT id, short_code, filepath FROM videos WHERE size IS NULL")
+        rows = await cursor.fetchall()
+        if not rows:
+            return
+        sizes = await run_in("blocking_io", _file_sizes, [(row["id"], row["filepath"]) for row in rows])
+        missing = {row["id"] for row in rows} - {row_id for row_id, size in sizes if size is not None}
+        now = time.time()
+        await db.executemany(
+            "UPDATE videos SET size = ?, created_at = COALESCE(created_at, ?) WHERE id = ?",
+            [(size, now, row_id) for row_id, size in sizes if size is not None]
+        )
+        await db.executemany(
+            "DELETE FROM videos WHERE id = ?", [(row_id,) for row_id in missing]
+        )
+        await db.commit()
+        for row in rows:
+            if row["id"] in missing:
+                self.forget(row["short_code"])
+
+    async def sweep(self):
+        """Evict least recently served videos until usage is under the quota"""
+        await self._flush_access()
+        async with cache_db.pool.connection() as db:
+            await self._backfill_sizes(db)
+            cursor = await db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM videos")
+            self.tracked_files, self.tracked_bytes = await cursor.fetchone()
+            self.last_sweep = time.time()
+            if self.tracked_bytes <= self.quota:
+                return
+
+            target = self.quota * LOW_WATERMARK
+            cursor = await db.execute(
+                """
+                SELECT id, short_code, filepath, size FROM videos
+                WHERE pinned = 0 AND created_at <= ?
+                ORDER BY COALESCE(last_access, created_at) ASC
+                """,
+                (time.time() - self.min_age,)
+            )
+            victims = []
+            excess = self.tracked_bytes - target
+            for row in await cursor.fetchall():
+                if excess <= 0:
+                    break
+                victims.append(row)
+                excess -= row["size"] or 0
+            if not victims:
+                print("⚠️ Downloads over quota but nothing is old enough to evict")
+                return
+
+            await db.executemany("DELETE FROM videos WHERE id = ?", [(row["id"],) for row in victims])
+            await db.commit()
+
+        # Rows go first: a file is never listed after its delete has started
+        for row in victims:
+            self.forget(row["short_code"])
+        await run_in("blocking_io", self._remove_files, [row["filepath"] for row in victims])
+        freed = sum(row["size"] or 0 for row in victims)
+        self.tracked_bytes -= freed
+        self.tracked_files -= len(victims)
+        self.evicted_files += len(victims)
+        self.evicted_bytes += freed
+        print(f"🧹 Evicted {len(victims)} downloads ({freed // (1024 * 1024)} MB)")
+
+    @staticmethod
+    def _remove_files(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def set_pinned(self, short_code, pinned):
+        """Pin or unpin a stored video; False if the code is unknown"""
+        async with cache_db.pool.connection() as db:
+            cursor = await db.execute(
+                "UPDATE videos SET pinned = ? WHERE short_code = ?", (1 if pinned else 0, short_code)
+            )
+            await db.commit()
+        return cursor.rowcount > 0
+
+    def stats(self):
+        try:
+            disk = shutil.disk_usage(DOWNLOAD_DIR)
+            disk = {"total": disk.total, "used": disk.used, "free": disk.free}
+        except OSError:
+            disk = None
+        return {
+            "files": self.tracked_files,
+            "indexed_codes": len(self.paths),
+            "index_misses": self.index_misses,
+            "bytes": self.tracked_bytes,
+            "quota_bytes": self.quota,
+            "usage_ratio": round(self.tracked_bytes / self.quota, 3) if self.quota else 0.0,
+            "min_age_s": self.min_age,
+            "evicted_files": self.evicted_files,
+            "evicted_bytes": self.evicted_bytes,
+            "pending_access_updates": len(self._accessed),
+            "last_sweep": self.last_sweep,
+            "disk": disk,
+        }
+
+
+video_store = VideoStore()
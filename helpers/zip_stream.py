@@ -0,0 +1,142 @@
+import struct
+import time
+import zlib
+
+# ZIP_STORED writer that emits bytes as they are produced, so a ZIP can be
+# streamed straight into a response. Sizes and CRCs go in a data descriptor
+# after each entry; Zip64 records are added once offsets pass 4 GB.
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP_VERSION = 45  # 4.5 = Zip64
+FLAGS = 0x0008 | 0x0800  # data descriptor + UTF-8 names
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class ZipStream:
+    """
+    Usage:
+        yield zs.start_entry(name)
+        for chunk in data: yield zs.feed(chunk)
+        yield zs.end_entry()
+        ...
+        yield zs.finish()
+    """
+
+    def __init__(self, timestamp=None):
+        self.dos_time, self.dos_date = _dos_datetime(timestamp or time.time())
+        self.offset = 0
+        self.entries = []
+        self._current = None
+
+    def start_entry(self, name: str) -> bytes:
+        encoded = name.encode("utf-8")
+        self._current = {"name": encoded, "offset": self.offset, "crc": 0, "size": 0}
+        header = struct.pack(
+            "<IHHHHHIIIHH",
+            0x04034B50,
+            ZIP_VERSION,
+            FLAGS,
+            0,  # stored
+            self.dos_time,
+            self.dos_date,
+            0, 0, 0,  # crc/sizes follow in the data descriptor
+            len(encoded),
+            0,
+        ) + encoded
+        self.offset += len(header)
+        return header
+
+    def feed(self, chunk: bytes) -> bytes:
+        entry = self._current
+        entry["crc"] = zlib.crc32(chunk, entry["crc"])
+        entry["size"] += len(chunk)
+        self.offset += len(chunk)
+        return chunk
+
+    def end_entry(self) -> bytes:
+        entry = self._current
+        if entry["size"] >= ZIP64_LIMIT:
+            raise ValueError(f"{entry['name']!r} is too large for a streamed entry")
+        descriptor = struct.pack("<IIII", 0x08074B50, entry["crc"], entry["size"], entry["size"])
+        self.offset += len(descriptor)
+        self.entries.append(entry)
+        self._current = None
+        return descriptor
+
+    def finish(self) -> bytes:
+        cd_offset = self.offset
+        central = b""
+        for entry in self.entries:
+            extra = b""
+            offset = entry["offset"]
+            if offset >= ZIP64_LIMIT:
+                extra = struct.pack("<HHQ", 0x0001, 8, offset)
+                offset = ZIP64_MARKER
+            central += struct.pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50,
+                ZIP_VERSION,
+                ZIP_VERSION,
+                FLAGS,
+                0,
+                self.dos_time,
+                self.dos_date,
+                entry["crc"],
+                entry["size"],
+                entry["size"],
+                len(entry["name"]),
+                len(extra),
+                0, 0, 0, 0,
+                offset,
+            ) + entry["name"] + extra
+
+        cd_size = len(central)
+        count = len(self.entries)
+        tail = b""
+        zip64 = cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT or count >= 0xFFFF
+        if zip64:
+            zip64_eocd_offset = cd_offset + cd_size
+            tail += struct.pack(
+                "<IQHHIIQQQQ",
+                0x06064B50,
+                44,
+                ZIP_VERSION,
+                ZIP_VERSION,
+                0, 0,
+                count,
+                count,
+                cd_size,
+                cd_offset,
+            )
+            tail += struct.pack("<IIQI", 0x07064B50, 0, zip64_eocd_offset, 1)
+        tail += struct.pack(
+            "<IHHHHIIH",
+            0x06054B50,
+            0, 0,
+            0xFFFF if zip64 else count,
+            0xFFFF if zip64 else count,
+            ZIP64_MARKER if zip64 else cd_size,
+            ZIP64_MARKER if zip64 else cd_offset,
+            0,
+        )
+        self.offset += cd_size + len(tail)
+        return central + tail
+
+
+def predict_zip_size(files):
+    """Exact archive size for [(name, size), ...] as written by ZipStream"""
+    zs = ZipStream()
+    total = 0
+    for name, size in files:
+        total += len(zs.start_entry(name))
+        zs._current["size"] = size
+        zs.offset += size
+        total += size + len(zs.end_entry())
+    return total + len(zs.finish())
@@ -2,70 +2,110 @@ import uuid
 import json
 import traceback
 import io
-import zipfile
 import asyncio
 from fastapi import APIRouter, Query, Depends,Request
-from fastapi.responses import JSONResponse,StreamingResponse,Response
+from fastapi.responses import JSONResponse,StreamingResponse,Response,FileResponse
+from email.utils import formatdate,parsedate_to_datetime
 import httpx
+import db as cache_db
 from db import get_db
-from helpers.anime_helper import get_pahewin_link,get_episode_session,get_kiwi_url,get_redirect_link
+from helpers.anime_helper import get_pahewin_link,get_episode_range,get_kiwi_url,get_redirect_link
 from helpers.anime_helper import get_animepahe_cookies,get_actual_episode,get_cached_anime_info
+from helpers.http_client import get_client
+from helpers.zip_stream import ZipStream,predict_zip_size
+from helpers.fetch_engine import FetchEngine
+from helpers.pipeline import resolve_pipeline
+from helpers.link_cache import link_cache
+from helpers.search_cache import search_cache
+from helpers.image_cache import image_cache
 from utils.helper import generate_internal_id,encodeURIComponent
+from utils.auth import require_admin_key
 router = APIRouter(prefix="/anime", tags=["Anime"])
+# Max concurrent episode-count lookups per search
+SEARCH_EPISODE_CONCURRENCY = 5
+
+async def _search_animepahe(query):
+    """Search animepahe and register new titles in anime_info"""
+    search_result = []
+    await get_animepahe_cookies()
+    client = get_client("animepahe")
+    encode_query = await encodeURIComponent(query)
+    res = await client.get(f"https://animepahe.si/api?m=search&q={encode_query}", timeout=30)
+    try:
+        results = res.json()
+    except ValueError:
+        print("❌ Not a JSON response:", res.text[:200])  # show first part of the response for debugging
+        raise
+
+    info = results.get('data') or []
+    sessions = [i.get("session") for i in info]
+    
+    # Existing internal ids in one query
+    placeholders = ",".join("?" * len(sessions))
+    async with cache_db.pool.connection() as db:
+        cursor = await db.execute(
+            f"SELECT internal_id, external_id FROM anime_info WHERE external_id IN ({placeholders})",
+            sessions)
+        known_ids = {row["external_id"]: row["internal_id"] for row in await cursor.fetchall()}
+    
+    # Live episode counts for airing shows, fetched concurrently with a bound.
+    # No connection is held across these upstream calls.
+    limit = asyncio.Semaphore(SEARCH_EPISODE_CONCURRENCY)
+    
+    async def episode_count(i):
+        if i.get("episodes") == 0 or i.get("status") == "Currently Airing":
+            async with limit:
+                return await get_actual_episode(i.get("session"))
+        return i.get("episodes")
+    
+    episode_counts = await asyncio.gather(*[episode_count(i) for i in info])
+    
+    new_rows = []
+    for i, episodes in zip(info, episode_counts):
+        internal_id = known_ids.get(i.get("session"))
+        if not internal_id:
+            internal_id = await generate_internal_id(i.get("title"))
+            new_rows.append((internal_id, i.get("session"), i.get("title"), episodes))
+        filtered_search_result = {
+            "id": internal_id,
+            "title": i.get("title"),
+            "episodes": episodes,
+            "status": i.get("status"),
+            "year": i.get("year"),
+            "poster": i.get("poster"),
+            "rating": i.get("score")
+        }
+        search_result.append(filtered_search_result)
+    
+    # Upsert all new rows in a single transaction
+    if new_rows:
+        async with cache_db.pool.connection() as db:
+            await db.executemany('''
+                INSERT INTO anime_info(internal_id, external_id, title, episodes)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(external_id) DO UPDATE SET
+                    title = excluded.title,
+                    episodes = excluded.episodes
+            ''', new_rows)
+            await db.commit()
+    return search_result
+
+
 @router.get("/search", description="Searches for a specific anime", summary="Search anime")
-async def anime_search(query: str = Query(..., description="Anime name for the search",example="one piece"),db = Depends(get_db)):
+async def anime_search(query: str = Query(..., description="Anime name for the search",example="one piece")):
     if not query:
         return JSONResponse(status_code=400,content={
             "status":400,
             "message":"Query is a required parameter"
         })
-    search_result = []
     try:
-        cookies = await get_animepahe_cookies(db)
-        async with httpx.AsyncClient(cookies=cookies,timeout=30) as client:
-            encode_query = await encodeURIComponent(query)
-            res = await client.get(f"https://animepahe.si/api?m=search&q={encode_query}")
-        try:
-            results = res.json()
-        except ValueError:
-            print("❌ Not a JSON response:", res.text[:200])  # show first part of the response for debugging
-            return JSONResponse(status_code=500,content={
-                "status":500,
-                "message":"An error occured"
-            })
-
-        info = results.get('data')
-        for i in info:
-            cursor = await db.execute(
-                "SELECT internal_id FROM anime_info WHERE external_id = ?", (i.get("session"),))
-            row = await cursor.fetchone()
-            episodes = await get_actual_episode(i.get("session"),db) if i.get(
-                "episodes") == 0 or i.get("status") == "Currently Airing" else i.get("episodes")
-            if not row:
-                internal_id = await generate_internal_id(i.get("title"))
-                await db.execute('''
-                INSERT INTO anime_info(internal_id, external_id, title, episodes)
-VALUES (?, ?, ?, ?)
-ON CONFLICT(external_id) DO UPDATE SET
-    title = excluded.title,
-    episodes = excluded.episodes;
-
-                ''',
-                        (internal_id, i.get("session"), i.get("title"), episodes))
-                await db.commit()
-            else:
-                internal_id = row["internal_id"]
-            filtered_search_result = {
-                "id": internal_id,
-                "title": i.get("title"),
-                "episodes": episodes,
-                "status": i.get("status"),
-                "year": i.get("year"),
-                "poster": i.get("poster"),
-                "rating": i.get("score")
-            }
-            search_result.append(filtered_search_result)
-        return search_result
+        # Stale results are returned at once while one background refresh runs
+        return await search_cache.get(query, _search_animepahe)
+    except ValueError:
+        return JSONResponse(status_code=500,content={
+            "status":500,
+            "message":"An error occured"
+        })
     except httpx.ConnectError:
         print("Connection error occured")
         traceback.print_exc()
@@ -88,6 +128,17 @@ ON CONFLICT(external_id) DO UPDATE SET
             "message":"Internal Server error"
         })
 
+
+@router.delete(
+    "/search/cache",
+    description="Invalidate cached search results (requires X-Admin-Key)",
+    summary="Clear search cache",
+    dependencies=[Depends(require_admin_key)]
+)
+async def clear_search_cache(query: str = Query(None, description="Query to invalidate, all queries if omitted")):
+    await search_cache.invalidate(query)
+    return {"status": 200, "message": "Search cache cleared"}
+
 @router.get("/download", description="Download anime using id gotten from search",summary="Download anime")
 async def anime_download(id:str = Query(...,description="id for the anime from search",example="OP3526"),episode:int = Query(...,description="Anime episode number",example=6),db= Depends(get_db)):
     if not id or not episode:
@@ -118,22 +169,22 @@ async def anime_download(id:str = Query(...,description="id for the anime from s
             "status":400,
             "message": "Episode count cannot be zero or below"
         })
-    cursor = await db.execute(
-        "SELECT * FROM cached_video_url WHERE internal_id = ? and episode = ?", (id, episode))
-    row = await cursor.fetchone()
-    if row and row["video_url"]:
-        link = row["video_url"]
-        async with httpx.AsyncClient(timeout=10) as client:
-            res = await client.head(link)
-        if res.status_code == 200:
-            return {
-                "status": 200,
-                "direct_link": row["video_url"],
-                "size": row["size"],
-                "episode": row["episode"]
-            }
-    search_result = await get_episode_session(info["external_id"],db)
-    episode_info = search_result[int(episode)-1]
+    # Served without a HEAD while the link's expiry allows
+    cached = await link_cache.get(id, episode, db)
+    if cached:
+        return {
+            "status": 200,
+            "direct_link": cached["direct_link"],
+            "size": cached["size"],
+            "episode": cached["episode"]
+        }
+    search_result = await get_episode_range(info["external_id"], int(episode))
+    if not search_result:
+        return JSONResponse(status_code=404,content={
+            "status": 404,
+            "message": "Episode not found"
+        })
+    episode_info = search_result[0]
     episode_session = episode_info.get("session")
     episode_snapshot = episode_info.get("snapshot")
     pahe_link = await get_pahewin_link(info["external_id"], episode_session)
@@ -201,10 +252,9 @@ async def anime_bulk_download(
     
     # Create list of episode numbers to fetch
     episodes = list(range(ep_from, ep_to + 1))
-    semaphore = asyncio.Semaphore(5)
-    # Fetch all episodes concurrently with asyncio.gather
+    # Resolve all episodes concurrently; stage workers bound the upstream load
     download_links = await asyncio.gather(*[
-        _fetch_single_episode(id, episode, info["external_id"], db,semaphore)
+        _fetch_single_episode(id, episode, info["external_id"], db)
         for episode in episodes
     ])
     
@@ -237,71 +287,46 @@ async def anime_bulk_download(
     })
 
 
-async def _fetch_single_episode(id: str, episode: int, external_id: str, db, semaphore):
+async def _fetch_single_episode(id: str, episode: int, external_id: str, db):
     """Helper function to fetch a single episode link"""
-      # Only N requests at once
     try:
-        # Check cache first
-        cursor = await db.execute(
-            "SELECT * FROM cached_video_url WHERE internal_id = ? and episode = ?", 
-            (id, episode)
-        )
-        row = await cursor.fetchone()
-        
-        if row and row["video_url"]:
-            link = row["video_url"]
-            
-            try:
-                async with httpx.AsyncClient(timeout=10) as client:
-                    res = await client.head(link)
-                
-                if res.status_code == 200:
-                    return {
-                        "episode": row["episode"],
-                        "direct_link": row["video_url"],
-                        "size": row["size"],
-                        "snapshot": row["snapshot"],
-                        "status": 200
-                    }
-            except Exception as e:
-                print(f"⚠️ Episode {episode}: Cached link check failed ({e}), fetching fresh...")
-        
-        # Fetch fresh link
-        
-        # Add delay between requests
-        await asyncio.sleep(0.5)
-        
-        search_result = await get_episode_session(external_id, db)
-        episode_info = search_result[episode - 1]
-        episode_session = episode_info.get("session")
-        episode_snapshot = episode_info.get("snapshot")
-        
-        pahe_link = await get_pahewin_link(external_id, episode_session,db)
-        if not pahe_link:
-            print(f"❌ Episode {episode}: No pahe link found")
-            return None
-        
-        kiwi_url = await get_kiwi_url(pahe_link)
-        if not kiwi_url:
-            print(f"❌ Episode {episode}: No kiwi URL found")
-            return None
-        
-        results = await get_redirect_link(kiwi_url, id, episode, db, episode_snapshot)
+        # Check cache first (no HEAD while the link's expiry allows)
+        cached = await link_cache.get(id, episode, db)
+        if cached:
+            return {
+                "episode": cached["episode"],
+                "direct_link": cached["direct_link"],
+                "size": cached["size"],
+                "snapshot": cached["snapshot"],
+                "status": 200
+            }
         
-        if results and results.get("status") == 200:
-            return results
-        else:
-            print(f"❌ Episode {episode}: Failed to get redirect link")
-            return None
+        # Fetch fresh link through the staged pipeline (bounded per upstream)
+        return await resolve_pipeline.resolve(id, episode, external_id)
             
     except Exception as e:
         print(f"❌ Episode {episode}: Error - {e}")
-        import traceback
         traceback.print_exc()
         return None
-import os
-import tempfile
-import shutil
+
+
+ZIP_CHUNK_SIZE = 64 * 1024
+MIN_EPISODE_SIZE = 100000  # smaller bodies are error pages, not episodes
+
+
+async def _episode_sizes(client, urls):
+    """HEAD every episode concurrently -> [(size or None, accepts ranges)]"""
+    async def head(url):
+        try:
+            res = await client.head(url, timeout=30, headers={"Accept-Encoding": "identity"})
+            if res.status_code == 200 and res.headers.get("content-length"):
+                ranges = res.headers.get("accept-ranges", "").lower() == "bytes"
+                return int(res.headers["content-length"]), ranges
+        except Exception as e:
+            print(f"⚠️ HEAD failed for {url}: {e}")
+        return None, False
+    return await asyncio.gather(*[head(url) for url in urls])
+
 
 @router.get("/bulk-download-zip")
 async def bulk_download_zip_get(
@@ -309,8 +334,8 @@ async def bulk_download_zip_get(
     db = Depends(get_db)
 ):
     """
-    Download episodes to disk, ZIP them, stream, then delete
-    Uses 2x bandwidth but WORKS every time!
+    Stream episodes straight from the CDN into a ZIP_STORED archive.
+    Nothing is buffered or written to disk; memory stays at one chunk.
     """
     
     
@@ -335,132 +360,151 @@ async def bulk_download_zip_get(
     # Create filename: gachiakuta_19-21_episodes.zip
     zip_filename = f"{anime_title}_{from_ep}-{to_ep}_episodes.zip"
     
+    # Shared CDN client (kwik Referer, follows redirects)
+    client = get_client("cdn")
+    entries = [
+        (f"{anime_title}_Episode_{str(link_info.get('episode')).zfill(3)}.mp4", link_info["direct_link"])
+        for link_info in links if link_info.get("direct_link")
+    ]
+    heads = await _episode_sizes(client, [url for _, url in entries])
+    entries = [(name, url, size, ranges) for (name, url), (size, ranges) in zip(entries, heads)]
     
-    # Create temporary directory
-    temp_dir = tempfile.mkdtemp()
-    zip_path = os.path.join(temp_dir, zip_filename)
+    # Exact archive size is only known when every HEAD returned a length
+    content_length = None
+    if entries and all(size for _, _, size, _ in entries):
+        entries = [entry for entry in entries if entry[2] > MIN_EPISODE_SIZE]
+        content_length = predict_zip_size([(name, size) for name, _, size, _ in entries])
     
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Referer': 'https://kwik.cx/',
-        }
-        
-        # Step 1: Download all episodes to disk
-        downloaded_files = []
-        
-        async with httpx.AsyncClient(timeout=300, follow_redirects=True, headers=headers) as client:
-            for link_info in links:
-                episode = link_info.get("episode")
-                url = link_info.get("direct_link")
-                
-                if not url:
-                    continue
-                
-                filename = f"{anime_title}_Episode_{str(episode).zfill(3)}.mp4"
-                filepath = os.path.join(temp_dir, filename)
-                
-                
-                try:
-                    response = await client.get(url, timeout=300)
+    if not entries:
+        return JSONResponse(status_code=500, content={"status": 500, "message": "No episodes downloaded"})
+    
+    async def stream_zip_segmented():
+        # Sizes are known: parallel range segments, any failure aborts
+        zs = ZipStream()
+        current = None
+        files = [(url, size, ranges) for _, url, size, ranges in entries]
+        async for index, chunk in FetchEngine(client).stream(files):
+            if index != current:
+                if current is not None:
+                    yield zs.end_entry()
+                yield zs.start_entry(entries[index][0])
+                current = index
+            yield zs.feed(chunk)
+        if current is not None:
+            yield zs.end_entry()
+        yield zs.finish()
+    
+    async def stream_zip():
+        zs = ZipStream()
+        for name, url, _, _ in entries:
+            started = False
+            try:
+                async with client.stream(
+                    "GET", url, timeout=300, headers={"Accept-Encoding": "identity"}
+                ) as response:
+                    length = response.headers.get("content-length")
+                    if response.status_code != 200 or (length and int(length) <= MIN_EPISODE_SIZE):
+                        raise RuntimeError(f"upstream returned {response.status_code}")
                     
-                    if response.status_code == 200 and len(response.content) > 100000:
-                        # Save to disk
-                        with open(filepath, 'wb') as f:
-                            f.write(response.content)
-                        
-                        downloaded_files.append(filepath)
-                    else:
-                        print(f"❌ Episode {episode} failed: {response.status_code}")
-                
-                except Exception as e:
-                    print(f"❌ Episode {episode} error: {e}")
-                    continue
-        
-        if not downloaded_files:
-            return JSONResponse(status_code=500, content={"status": 500, "message": "No episodes downloaded"})
-        
-        # Step 2: Create ZIP from downloaded files
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as zip_file:
-            for filepath in downloaded_files:
-                zip_file.write(filepath, os.path.basename(filepath))
-        
-        zip_size = os.path.getsize(zip_path)
-        
-        # Step 3: Stream the ZIP file
-        def iterate_file():
-            with open(zip_path, 'rb') as f:
-                chunk_size = 64 * 1024
-                while True:
-                    chunk = f.read(chunk_size)
-                    if not chunk:
-                        break
-                    yield chunk
-        
-        # Delete session
-        await db.execute("DELETE FROM download_sessions WHERE session_id = ?", (session_id,))
-        await db.commit()
-        
-        # Return streaming response with proper filename
-        response = StreamingResponse(
-            iterate_file(),
-            media_type="application/zip",
-            headers={
-                "Content-Disposition": f'attachment; filename="{zip_filename}"',
-                "Content-Length": str(zip_size)  # Exact size!
-            }
-        )
-        
-        # Schedule cleanup after response is sent
-        async def cleanup():
-            await asyncio.sleep(5)  # Wait for download to start
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            print(f"🗑️ Cleaned up temp directory")
-        
-        asyncio.create_task(cleanup())
-        
-        return response
+                    yield zs.start_entry(name)
+                    started = True
+                    async for chunk in response.aiter_bytes(ZIP_CHUNK_SIZE):
+                        yield zs.feed(chunk)
+            except Exception as e:
+                print(f"❌ {name} error: {e}")
+            # A cut-off episode is still closed so the archive stays valid
+            if started:
+                yield zs.end_entry()
+        yield zs.finish()
     
-    except Exception as e:
-        # Cleanup on error
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        print(f"❌ Error: {e}")
-        return JSONResponse(status_code=500, content={"status": 500, "message": str(e)})
+    # Delete session
+    await db.execute("DELETE FROM download_sessions WHERE session_id = ?", (session_id,))
+    await db.commit()
+    
+    headers = {"Content-Disposition": f'attachment; filename="{zip_filename}"'}
+    if content_length:
+        headers["Content-Length"] = str(content_length)  # Exact size!
+    
+    return StreamingResponse(
+        stream_zip_segmented() if content_length else stream_zip(),
+        media_type="application/zip",
+        headers=headers
+    )
+
+def _not_modified_since(request: Request, last_modified: str) -> bool:
+    since = request.headers.get("if-modified-since")
+    if not since:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(since)
+    except (TypeError, ValueError):
+        return False
+
 
 @router.get("/proxy-image", description="Proxy images from animepahe")
 async def proxy_image(
-    url: str = Query(..., description="Image URL to proxy"), db= Depends(get_db)
+    request: Request,
+    url: str = Query(..., description="Image URL to proxy")
 ):
     """
-    Proxy images from animepahe with cookies to bypass 403
+    Proxy images from animepahe with cookies to bypass 403.
+    Served from the disk cache when possible; misses stream through while
+    being written to it.
     """
     
     # Validate it's from animepahe (security)
     if "animepahe.si" not in url:
         return Response(status_code=400, content="Invalid image URL")
     
+    cache_headers = {
+        "Cache-Control": "public, max-age=86400",  # Cache for 1 day
+    }
+    
+    cached = await image_cache.lookup(url)
+    if cached:
+        # The ETag comes from the stored bytes, so a refetched image that
+        # changed no longer matches old validators
+        path, content_type, last_modified, etag = cached
+        cache_headers["Last-Modified"] = last_modified
+        cache_headers["ETag"] = etag
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in if_none_match:
+            return Response(status_code=304, headers=cache_headers)
+        if not if_none_match and _not_modified_since(request, last_modified):
+            return Response(status_code=304, headers=cache_headers)
+        return FileResponse(path, media_type=content_type, headers=cache_headers)
+    
     try:
-        # Get animepahe cookies
-        cookies = await get_animepahe_cookies(db)
-        
-        # Fetch image with cookies
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(url, cookies=cookies)
+        # Get animepahe cookies (loaded into the shared jar)
+        await get_animepahe_cookies()
         
-        if response.status_code == 200:
-            # Return image with proper content type
-            return Response(
-                content=response.content,
-                media_type=response.headers.get("content-type", "image/jpeg"),
-                headers={
-                    "Cache-Control": "public, max-age=86400",  # Cache for 1 day
-                }
-            )
-        else:
-            # Return placeholder or 404
-            return Response(status_code=response.status_code)
-            
+        # Fetch image with the shared animepahe client
+        client = get_client("animepahe")
+        response = await client.send(client.build_request("GET", url, timeout=10), stream=True)
     except Exception as e:
         print(f"Error proxying image: {e}")
-        return Response(status_code=500)
\ No newline at end of file
+        return Response(status_code=500)
+    
+    if response.status_code != 200:
+        await response.aclose()
+        # Return placeholder or 404
+        return Response(status_code=response.status_code)
+    
+    content_type = response.headers.get("content-type", "image/jpeg")
+    writer = image_cache.writer(url, content_type)
+    
+    async def stream_and_store():
+        stored = False
+        try:
+            async for chunk in response.aiter_bytes():
+                await writer.write(chunk)
+                yield chunk
+            await writer.commit()
+            stored = True
+        finally:
+            if not stored:
+                await writer.abort()
+            await response.aclose()
+    
+    cache_headers["Last-Modified"] = formatdate(usegmt=True)
+    return StreamingResponse(stream_and_store(), media_type=content_type, headers=cache_headers)
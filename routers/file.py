@@ -1,33 +1,95 @@
 import os
-from fastapi import APIRouter, Query, HTTPException, Depends,Path
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import APIRouter, Query, HTTPException, Depends,Path, Request
 from fastapi import Query
 from fastapi.responses import Response
 from fastapi.responses import FileResponse
-from db import get_db
+from helpers.video_store import video_store
+from helpers.executors import run_in
+from utils.auth import require_admin_key
 
 file_router = APIRouter(prefix="/file",tags=["file"])
-@file_router.get("/{code}")
+
+
+class VideoFileResponse(FileResponse):
+    """
+    FileResponse with a strong size+mtime ETag. Starlette handles Range,
+    If-Range and 416 itself, and hands the whole file to the server as a
+    pathsend (zero-copy sendfile) when the server supports it.
+    """
+    # Range requests are streamed through Python; larger reads mean fewer
+    # round trips through the thread pool for multi-MB seeks
+    chunk_size = 1024 * 1024
+
+
+def file_etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _not_modified(request: Request, etag, stat):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@file_router.api_route("/{code}", methods=["GET", "HEAD"])
 async def get_file(
+    request: Request,
     code: str = Path(..., description="Code for given file"),
-    db=Depends(get_db)
 ):
-    # Query the file path
-    cursor = await db.execute(
-        "SELECT filepath FROM videos WHERE short_code = ?", (code,)
-    )
-    row = await cursor.fetchone()
+    # Short code -> path from the in-memory index, one stat for the headers
+    file_path = await video_store.lookup(code)
 
-    if not row:
+    if not file_path:
         raise HTTPException(status_code=404, detail="Video not found")
 
-    file_path = row["filepath"]
-
-    if not file_path or not os.path.exists(file_path):
+    try:
+        stat = await run_in("blocking_io", os.stat, file_path)
+    except OSError:
+        video_store.forget(code)
         raise HTTPException(status_code=404, detail="File not found on disk")
 
+    video_store.touch(code)
+    etag = file_etag(stat)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "private, max-age=3600",
+    }
+    if _not_modified(request, etag, stat):
+        return Response(status_code=304, headers=headers)
+
     filename = os.path.basename(file_path)
 
-    # Return the file
-    return FileResponse(path=file_path, filename=filename, media_type="application/octet-stream")
+    # Return the file (Range / If-Range aware)
+    return VideoFileResponse(
+        path=file_path,
+        filename=filename,
+        media_type="application/octet-stream",
+        headers=headers,
+        stat_result=stat,
+    )
+
+
+@file_router.put("/{code}/pin", summary="Pin a downloaded video", dependencies=[Depends(require_admin_key)])
+async def pin_file(code: str = Path(..., description="Code for given file")):
+    """Keep the file out of quota eviction"""
+    if not await video_store.set_pinned(code, True):
+        raise HTTPException(status_code=404, detail="Video not found")
+    return {"status": 200, "short_code": code, "pinned": True}
 
 
+@file_router.delete("/{code}/pin", summary="Unpin a downloaded video", dependencies=[Depends(require_admin_key)])
+async def unpin_file(code: str = Path(..., description="Code for given file")):
+    """Let quota eviction remove the file again"""
+    if not await video_store.set_pinned(code, False):
+        raise HTTPException(status_code=404, detail="Video not found")
+    return {"status": 200, "short_code": code, "pinned": False}
@@ -0,0 +1,87 @@
+from fastapi import APIRouter
+from helpers.http_client import get_pool_stats
+from db import get_sqlite_stats
+from helpers.fetch_engine import get_download_stats
+from helpers.pipeline import resolve_pipeline
+from helpers.link_cache import link_cache
+from helpers.search_cache import search_cache
+from helpers.image_cache import image_cache
+from helpers.analytics_buffer import analytics_buffer
+from helpers.geoip import geoip
+from helpers.download_jobs import download_jobs
+from helpers.video_store import video_store
+from helpers.executors import get_executor_stats
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/http", summary="Upstream HTTP pool stats")
+async def http_pool_stats():
+    """Connection and request stats for each upstream client"""
+    return get_pool_stats()
+
+
+@router.get("/sqlite", summary="SQLite pool stats")
+async def sqlite_pool_stats():
+    """Reader/writer availability and pool wait times"""
+    return get_sqlite_stats()
+
+
+@router.get("/downloads", summary="Bulk download throughput")
+async def download_stats():
+    """Aggregate MB/s, segment and retry counters of the fetch engine"""
+    return get_download_stats()
+
+
+@router.get("/pipeline", summary="Episode resolution stage stats")
+async def pipeline_stats():
+    """Queue depth, throughput and latency for each resolution stage"""
+    return resolve_pipeline.stats()
+
+
+@router.get("/links", summary="Direct link cache stats")
+async def link_cache_stats():
+    """Hit ratio, revalidations and the learned link lifetime"""
+    return link_cache.stats()
+
+
+@router.get("/search", summary="Search cache stats")
+async def search_cache_stats():
+    """Fresh/stale hit ratio of the search result cache"""
+    return search_cache.stats()
+
+
+@router.get("/images", summary="Image proxy cache stats")
+async def image_cache_stats():
+    """Disk usage, hit ratio and evictions of the image proxy cache"""
+    return image_cache.stats()
+
+
+@router.get("/analytics", summary="Analytics ingestion buffer stats")
+async def analytics_buffer_stats():
+    """Queue depth and batch writer counters for /analytics/track"""
+    return analytics_buffer.stats()
+
+
+@router.get("/geoip", summary="Offline GeoIP stats")
+async def geoip_stats():
+    """Loaded ranges and LRU hit ratio of the GeoIP tables"""
+    return geoip.stats()
+
+
+@router.get("/jobs", summary="Download job queue stats")
+async def download_job_stats():
+    """Queue depth, wait time and per-job throughput of /dl/jobs"""
+    return download_jobs.stats()
+
+
+@router.get("/storage", summary="Downloaded video storage")
+async def storage_stats():
+    """Disk usage against the downloads quota and eviction counters"""
+    return video_store.stats()
+
+
+@router.get("/executors", summary="Blocking work executor stats")
+async def executor_stats():
+    """Workers, queue depth and wait/run times of each named executor"""
+    return get_executor_stats()
@@ -1,19 +1,53 @@
 import os
-from fastapi import APIRouter, Query, HTTPException, Depends,Path
+from fastapi import APIRouter, Query, HTTPException, Depends,Path, Request
 from fastapi.responses import FileResponse
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+import json
+from urllib.parse import quote
 from utils.helper import check_platform
-from helpers.download import videoDL,videoDL_for_insta
+from helpers.download import videoDL,videoDL_for_insta, open_stream, STREAM_CHUNK_SIZE
 from db import get_db
+from helpers.download_jobs import download_jobs, public_job
 
 router = APIRouter(prefix="/dl", tags=["downloaders"])
 
+STREAM_DESCRIPTION = "Pipe the video straight to the response instead of storing it and returning a /file link"
+# Upstream headers relayed to the client in stream mode
+STREAM_HEADERS = ("content-length", "content-range", "accept-ranges", "last-modified", "etag")
+
+
+async def stream_download(request: Request, url, insta=False):
+    """
+    Stream mode: the progressive format is relayed chunk by chunk from the
+    media URL, nothing is written to downloads/. A Range header is passed
+    upstream so players can seek.
+    """
+    source, response = await open_stream(url, insta, request.headers.get("range"))
+    if response is None:
+        return JSONResponse(status_code=source["status"], content=source)
+
+    async def relay():
+        try:
+            async for chunk in response.aiter_raw(STREAM_CHUNK_SIZE):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    headers = {name: response.headers[name] for name in STREAM_HEADERS if name in response.headers}
+    headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(source['filename'])}"
+    return StreamingResponse(
+        relay(),
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type", "video/mp4"),
+        headers=headers,
+    )
+
 
 @router.get("/tiktok",
             description="A tiktok downloader route that returns video info and download url for each video.",
             summary="Download Tiktok"
             )
-async def tiktok_DL(url: str = Query(..., description="tiktok url", example="https://vm.tiktok.com/XXXXX"), db=Depends(get_db)):
+async def tiktok_DL(request: Request, url: str = Query(..., description="tiktok url", example="https://vm.tiktok.com/XXXXX"), db=Depends(get_db), stream: bool = Query(False, description=STREAM_DESCRIPTION)):
     if not url:
         return JSONResponse(status_code=400, content={
             "status": 400,
@@ -26,6 +60,9 @@ async def tiktok_DL(url: str = Query(..., description="tiktok url", example="htt
             "message": "Not a valid tiktok link"
         })
 
+    if stream:
+        return await stream_download(request, url)
+
     info = await videoDL(url, db)
     if info.get("status") == 422:
         return JSONResponse(status_code=422, content={
@@ -40,7 +77,7 @@ async def tiktok_DL(url: str = Query(..., description="tiktok url", example="htt
             description="A instagram downloader route that returns video info and download url for each video.",
             summary="Download instagram"
             )
-async def instagram_DL(url: str = Query(..., description="instagram url", example="https://www.instagram.com/XXXXX"), db=Depends(get_db)):
+async def instagram_DL(request: Request, url: str = Query(..., description="instagram url", example="https://www.instagram.com/XXXXX"), db=Depends(get_db), stream: bool = Query(False, description=STREAM_DESCRIPTION)):
     if not url:
         return JSONResponse(status_code=400, content={
             "status": 400,
@@ -53,6 +90,9 @@ async def instagram_DL(url: str = Query(..., description="instagram url", exampl
             "message": "Not a valid instagram link"
         })
 
+    if stream:
+        return await stream_download(request, url, insta=True)
+
     info = await videoDL_for_insta(url, db)
     if info.get("status") == 422:
         return JSONResponse(status_code=422, content={
@@ -67,7 +107,7 @@ async def instagram_DL(url: str = Query(..., description="instagram url", exampl
             description="A facebook downloader route that returns video info and download url for each video.",
             summary="Download facebook"
             )
-async def facebook_DL(url: str = Query(..., description="facebook url", example="https://www.facebook.com/XXXXX"), db=Depends(get_db)):
+async def facebook_DL(request: Request, url: str = Query(..., description="facebook url", example="https://www.facebook.com/XXXXX"), db=Depends(get_db), stream: bool = Query(False, description=STREAM_DESCRIPTION)):
     if not url:
         return JSONResponse(status_code=400, content={
             "status": 400,
@@ -80,6 +120,9 @@ async def facebook_DL(url: str = Query(..., description="facebook url", example=
             "message": "Not a valid facebook link"
         })
 
+    if stream:
+        return await stream_download(request, url)
+
     info = await videoDL(url, db)
     if info.get("status") == 422:
         return JSONResponse(status_code=422, content={
@@ -94,7 +137,7 @@ async def facebook_DL(url: str = Query(..., description="facebook url", example=
             description="A youtube downloader route that returns video info and download url for each video.",
             summary="Download youtube"
             )
-async def youtube_DL(url: str = Query(..., description="youtube url", example="https://www.youtube.com/XXXXX"), db=Depends(get_db)):
+async def youtube_DL(request: Request, url: str = Query(..., description="youtube url", example="https://www.youtube.com/XXXXX"), db=Depends(get_db), stream: bool = Query(False, description=STREAM_DESCRIPTION)):
     if not url:
         return JSONResponse(status_code=400, content={
             "status": 400,
@@ -107,6 +150,9 @@ async def youtube_DL(url: str = Query(..., description="youtube url", example="h
             "message": "Not a valid youtube link"
         })
 
+    if stream:
+        return await stream_download(request, url)
+
     info = await videoDL(url, db)
     if info.get("status") == 422:
         return JSONResponse(status_code=422, content={
@@ -117,3 +163,50 @@ async def youtube_DL(url: str = Query(..., description="youtube url", example="h
     info.pop("path",None)
     info.pop("short",None)
     return info
+
+
+@router.post("/jobs",
+             description="Queue a tiktok, youtube, facebook or instagram download. Returns a job id at once; poll it or subscribe to its events.",
+             summary="Submit download job"
+             )
+async def submit_download_job(url: str = Query(..., description="video url", example="https://www.youtube.com/XXXXX")):
+    platform = await check_platform(url)
+    if not platform:
+        return JSONResponse(status_code=400, content={
+            "status": 400,
+            "message": "Unsupported Url"
+        })
+    job = await download_jobs.submit(url, platform)
+    if job is None:
+        return JSONResponse(status_code=503, headers={"Retry-After": "30"}, content={
+            "status": 503,
+            "message": "Download queue is full, try again later"
+        })
+    return JSONResponse(status_code=202, content={
+        "status": 202,
+        **public_job(job),
+        "status_url": f"/dl/jobs/{job['id']}",
+        "events_url": f"/dl/jobs/{job['id']}/events"
+    })
+
+
+@router.get("/jobs/{job_id}", summary="Download job status")
+async def get_download_job(job_id: str = Path(..., description="Job id from /dl/jobs")):
+    job = download_jobs.jobs.get(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"status": 404, "message": "Job not found"})
+    return public_job(job)
+
+
+@router.get("/jobs/{job_id}/events", summary="Download job progress (Server-Sent Events)")
+async def download_job_events(job_id: str = Path(..., description="Job id from /dl/jobs")):
+    if job_id not in download_jobs.jobs:
+        return JSONResponse(status_code=404, content={"status": 404, "message": "Job not found"})
+
+    async def event_stream():
+        async for snapshot in download_jobs.events(job_id):
+            event = "progress" if snapshot["state"] in ("queued", "running") else snapshot["state"]
+            yield f"event: {event}\ndata: {json.dumps(snapshot)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,15 @@
+import os
+import secrets
+from fastapi import Header, HTTPException
+
+
+async def require_admin_key(x_admin_key: str = Header(None, description="Value of the ADMIN_KEY env var")):
+    """
+    Dependency for maintenance endpoints. Disabled (403) unless ADMIN_KEY is set,
+    401 when the X-Admin-Key header does not match it.
+    """
+    admin_key = os.getenv("ADMIN_KEY")
+    if not admin_key:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, admin_key):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
@@ -17,8 +17,10 @@ def check_platform_sync(url: str):
     return None
 
 
+# The async wrappers below are microseconds of work: a thread hop would cost
+# more than the call, so they run inline
 async def check_platform(url: str):
-    return await asyncio.to_thread(check_platform_sync, url)
+    return check_platform_sync(url)
 
 
 def generate_internal_id_sync(title: str) -> str:
@@ -53,99 +55,102 @@ def generate_internal_id_sync(title: str) -> str:
     return f"{prefix}{padded_number}"
 
 async def generate_internal_id(title):
-    return await asyncio.to_thread(generate_internal_id_sync,title)
+    return generate_internal_id_sync(title)
 
 def encodeURIComponent_sync(s):
     return quote(s, safe="~()*!.'")
 
 async def encodeURIComponent(s):
-    return await asyncio.to_thread(encodeURIComponent_sync,s)
+    return encodeURIComponent_sync(s)
 
-def deobfuscate(packed_code):
-    # 1. Extract the arguments from the eval(function(...)...) call
-    pattern = r'eval\(function\(.*?\)\{(.*?)\}\("(.*?)",(\d+),"(.*?)",(\d+),(\d+),(\d+)\)\)'
-    match = re.search(pattern, packed_code, re.S)
-
-    if not match:
-        print("No match found")
-        return None
-
-    func_body, payload, p1, delimiter, p2, p3, p4 = match.groups()
 
-    p1 = int(p1)
-    p2 = int(p2)
-    p3 = int(p3)
-    p4 = int(p4)
+# eval(function(h,u,n,t,e,r){...}("payload",u,"alphabet",offset,base,r))
+PACKER_PATTERN = re.compile(
+    r'eval\(function\(.*?\)\{(.*?)\}\("(.*?)",(\d+),"(.*?)",(\d+),(\d+),(\d+)\)\)', re.S
+)
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ+/"
 
-    # 2. Base conversion function (same logic as _0xe46c in JS)
-    def base_convert(zq, Pt, lS):
-        g = list("0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ+/")
-        h = g[:Pt]
-        i = g[:lS]
 
-        # Convert reversed encoded string → integer
-        j = 0
-        for power, char in enumerate(reversed(zq)):
-            if char in h:
-                j += h.index(char) * (Pt ** power)
-
-        # Convert integer to base-lS
-        if j == 0:
-            return "0"
+class _DigitTable(dict):
+    """
+    Payload character -> (base ** digits, value) it adds to its chunk's
+    number. Mirrors replacing every alphabet symbol with its index, in order,
+    and reading the result in `base`, where characters outside the digit set
+    count as a 0 digit.
+    """
 
-        result = ""
-        while j > 0:
-            result = i[j % lS] + result
-            j //= lS
+    def __init__(self, alphabet, base):
+        super().__init__()
+        self.base = base
+        self.values = {d: v for v, d in enumerate(DIGITS[:base])}
+        for char in set(alphabet):
+            digits = char
+            for index, symbol in enumerate(alphabet):
+                digits = digits.replace(symbol, str(index))
+            value = 0
+            for d in digits:
+                value = value * base + self.values.get(d, 0)
+            self[char] = (base ** len(digits), value)
+
+    def __missing__(self, char):
+        # Not an alphabet symbol: one digit, read as itself
+        weight = self[char] = (self.base, self.values.get(char, 0))
+        return weight
 
-        return result
 
-    XP = ""
-    Qz = list(delimiter)
-    
-    i = 0
-    length = len(payload)
+def deobfuscate(packed_code):
+    """Unpack kwik's eval(function(h,u,n,t,e,r)...) script, linear in its length"""
+    match = PACKER_PATTERN.search(packed_code)
 
-    # 3. Loop through payload and decode chunks
-    while i < length:
-        s = ""
+    if not match:
+        print("No match found")
+        return None
 
-        # build chunk until hitting the separator character
-        while i < length and payload[i] != Qz[p3]:
-            s += payload[i]
-            i += 1
+    func_body, payload, p1, delimiter, offset, base, p4 = match.groups()
+    offset = int(offset)
+    base = int(base)
+    separator = delimiter[base]
+    table = _DigitTable(delimiter, base)
 
-        # skip delimiter
-        i += 1
+    # The same character is always encoded as the same chunk
+    decoded = {}
+    out = []
+    for chunk in payload.split(separator):
+        if not chunk:
+            continue
+        char = decoded.get(chunk)
+        if char is None:
+            number = 0
+            for c in chunk:
+                scale, value = table[c]
+                number = number * scale + value
+            char = decoded[chunk] = chr(number - offset)
+        out.append(char)
 
-        if s:
-            # Replace each delimiter symbol with its index
-            for idx, symbol in enumerate(Qz):
-                s = s.replace(symbol, str(idx))
+    return urllib.parse.unquote("".join(out))
 
-            # Convert chunk and append the decoded character
-            char_code = int(base_convert(s, p3, 10)) - p2
-            XP += chr(char_code)
 
-    # 4. Decode unicode
-    return urllib.parse.unquote(XP)
+EMBED_URL_PATTERN = re.compile(r"var\s+url\s*=\s*['\"]([^'\"]+)['\"]")
+FORM_ACTION_PATTERN = re.compile(r'<form[^>]+action=["\']([^"\']+)')
+TOKEN_PATTERN = re.compile(r'name="_token"\s+value=["\']([^"\']+)')
+SIZE_PATTERN = re.compile(r'\(([\d\.]+\s*[KMGT]?B)\)')
 
 
 def extract_info(js_code):
     # 1. Extract embed URL
-    embed_match = re.search(r"var\s+url\s*=\s*['\"]([^'\"]+)['\"]", js_code)
+    embed_match = EMBED_URL_PATTERN.search(js_code)
     embed_url = embed_match.group(1) if embed_match else None
 
     # 2. Extract kwik link from <form action="">
-    kwik_match = re.search(r'<form[^>]+action=["\']([^"\']+)', js_code)
+    kwik_match = FORM_ACTION_PATTERN.search(js_code)
     kwik_url = kwik_match.group(1) if kwik_match else None
 
     # 3. Extract _token value
-    token_match = re.search(r'name="_token"\s+value=["\']([^"\']+)', js_code)
+    token_match = TOKEN_PATTERN.search(js_code)
     token = token_match.group(1) if token_match else None
 
     # 4. Extract file size: (109.91 MB)
-    size_match = re.search(r'\(([\d\.]+\s*[KMGT]?B)\)', js_code)
+    size_match = SIZE_PATTERN.search(js_code)
     size = size_match.group(1) if size_match else None
 
     return {
@@ -154,4 +159,3 @@ def extract_info(js_code):
         "token": token,
         "size": size
     }
-
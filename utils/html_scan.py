@@ -0,0 +1,154 @@
+import html
+import re
+
+# Lightweight extractors for the pages parsed on every episode resolution
+# (animepahe play page, pahe.win, kwik). They scan only the fragment they
+# need instead of building a full BeautifulSoup tree, and follow
+# html.parser's rules for the parts they read: comments are skipped, script
+# and style bodies are raw text, tag/attribute names are case-insensitive and
+# attribute values and text are unescaped. Anything outside those rules
+# raises ScanError so the caller can fall back to BeautifulSoup.
+
+
+class ScanError(Exception):
+    """Markup the scanner does not handle; parse the page with BeautifulSoup"""
+
+
+# A start tag's attributes; quoted values may contain '>'
+_ATTRS = r"""[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*"""
+_TAG_REST = re.compile(_ATTRS + ">")
+_ATTR = re.compile(r"""([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+)))?""")
+# Markup whose content is not parsed as tags: comments and the raw text
+# elements, plus marked sections html.parser treats specially
+_RAW = r"<!--|<!\[|<(script|style"
+_MARKUP = re.compile(_RAW + r")(?=[\s/>])", re.I)
+# The same, plus <div> start tags
+_MARKUP_OR_DIV = re.compile(_RAW + r"|div)(?=[\s/>])", re.I)
+_RAW_END = {
+    "script": re.compile(r"</script", re.I),
+    "style": re.compile(r"</style", re.I),
+}
+_CLOSE_REST = re.compile(r"\s*>")
+
+_DIV_CLOSE = re.compile(r"</div", re.I)
+_UNSUPPORTED_IN_FRAGMENT = re.compile(r"<!--|<!\[|<(?:div|script|style)(?=[\s/>])", re.I)
+_ANCHOR = re.compile(r"<a(?=[\s/>])(" + _ATTRS + r")>(.*?)</a\s*>", re.I | re.S)
+_ANCHOR_START = re.compile(r"<a(?=[\s/>])", re.I)
+_TAG = re.compile(r"<[^>]*>")
+_KWIK_URL = re.compile(r"https?://(?:www\.)?kwik\.cx[^\s\"');]+")
+
+
+def _attrs(attrs_body):
+    """Attributes of a start tag (the text after its name), like html.parser"""
+    attrs = {}
+    for name, double, single, bare in _ATTR.findall(attrs_body.rstrip(">")):
+        attrs[name.lower()] = html.unescape(double or single or bare)
+    return attrs
+
+
+def _start_tag_end(page, pos):
+    match = _TAG_REST.match(page, pos)
+    if not match:
+        raise ScanError("unterminated start tag")
+    return match.end()
+
+
+def _tokens(page, pattern):
+    """
+    (kind, tag_end, body_start, body_end) for each comment ("comment"),
+    script/style element and, with _MARKUP_OR_DIV, <div> start tag, in
+    document order. Nothing inside a comment or raw text body is reported.
+    """
+    pos = 0
+    while True:
+        match = pattern.search(page, pos)
+        if not match:
+            return
+        token = match.group(0)
+        if token == "<![":
+            raise ScanError("marked section")
+        if token == "<!--":
+            end = page.find("-->", match.end())
+            if end < 0:
+                raise ScanError("unterminated comment")
+            yield "comment", match.end(), match.end(), end
+            pos = end + 3
+            continue
+
+        name = match.group(1).lower()
+        tag_name_end = match.end()
+        body_start = _start_tag_end(page, tag_name_end)
+        if name == "div" or page[body_start - 2] == "/":
+            # <div>, or <script ... /> (an empty element, what follows is markup)
+            yield name, tag_name_end, body_start, body_start
+            pos = body_start
+            continue
+        close = _RAW_END[name].search(page, body_start)
+        if not close:
+            raise ScanError(f"unterminated <{name}>")
+        rest = _CLOSE_REST.match(page, close.end())
+        if not rest:
+            raise ScanError(f"unusual </{name}> end tag")
+        yield name, tag_name_end, body_start, close.start()
+        pos = rest.end()
+
+
+def script_texts(page, limit=None):
+    """Raw bodies of the page's <script> elements, in document order"""
+    texts = []
+    for kind, _, body_start, body_end in _tokens(page, _MARKUP):
+        if kind != "script":
+            continue
+        texts.append(page[body_start:body_end])
+        if limit is not None and len(texts) >= limit:
+            break
+    return texts
+
+
+def first_kwik_url(page):
+    """kwik.cx link in the first <script> of a pahe.win page, or None"""
+    scripts = script_texts(page, limit=1)
+    if not scripts or "kwik" not in scripts[0]:
+        return None
+    match = _KWIK_URL.search(scripts[0])
+    return match.group(0) if match else None
+
+
+def _dropdown_fragment(page):
+    """Inner markup of the first <div id="pickDownload">, None if there is none"""
+    if "pickDownload" not in page:
+        return None
+    for kind, tag_name_end, body_start, _ in _tokens(page, _MARKUP_OR_DIV):
+        if kind != "div" or _attrs(page[tag_name_end:body_start]).get("id") != "pickDownload":
+            continue
+        close = _DIV_CLOSE.search(page, body_start)
+        if not close:
+            raise ScanError("unterminated dropdown")
+        fragment = page[body_start:close.start()]
+        if _UNSUPPORTED_IN_FRAGMENT.search(fragment):
+            raise ScanError("nested markup in the dropdown")
+        return fragment
+    return None
+
+
+def dropdown_links(page):
+    """
+    (href, text) of each a.dropdown-item in div#pickDownload, text as
+    get_text(" ", strip=True); None if the page has no such div
+    """
+    fragment = _dropdown_fragment(page)
+    if fragment is None:
+        return None
+    anchors = _ANCHOR.findall(fragment)
+    if len(anchors) != len(_ANCHOR_START.findall(fragment)):
+        raise ScanError("unclosed or nested anchor")
+    links = []
+    for attrs_body, inner in anchors:
+        attrs = _attrs(attrs_body)
+        if "dropdown-item" not in attrs.get("class", "").split():
+            continue
+        if "href" not in attrs:
+            raise ScanError("dropdown item without href")
+        pieces = (html.unescape(piece).strip() for piece in _TAG.split(inner))
+        links.append((attrs["href"], " ".join(piece for piece in pieces if piece)))
+    return links